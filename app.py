@@ -1,15 +1,29 @@
-import os, json
+import os, json, tempfile, hashlib
 import pandas as pd
 import datetime
 from settings import SettingsManager
-from collections import defaultdict
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Form, Request, Query, HTTPException
+from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse, JSONResponse, StreamingResponse, Response
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
 
-from weather_aggregator import WeatherAggregator
+from weather_aggregator import WeatherAggregator, fetch_limits, provider_pool
+from chart_series import build_series
+from storage.store_factory import get_store, storage_options
+from storage.report_export import iter_csv, write_xlsx
+from storage.report_cache import report_cache
+from storage.weather_store import page_order
+from storage.schema import apply_schema
+from providers.location_cache import location_cache
+from providers.rate_limiter import rate_limiter
+from providers.http_cache import http_cache
+from providers.html_parser import html_parser
+from providers.circuit_breaker import circuit_breakers
+from providers.browser_pool import browser_pool
 
 
 SETTINGS_FILE = "settings.json"
@@ -18,10 +32,14 @@ app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 scheduler = BackgroundScheduler()
+# Отдельный пул потоков для задач сбора по городам: стандартный пул планировщика (10 потоков) не рассчитан
+# на задачи, каждая из которых может занимать поток до tick_budget секунд
+COLLECTION_EXECUTOR = "collection"
+collection_executor = None
 
-def prepare_table_view(df: pd.DataFrame):
-    df = df.fillna('-')
-    df = df.rename(columns={"timestamp": "Время запроса",
+# Число строк таблицы, отдаваемых за один запрос
+TABLE_PAGE_SIZE = 50
+TABLE_COLUMN_LABELS = {"timestamp": "Время запроса",
                        "source": "Источник",
                        "city": "Город",
                        "T0": "Темп. (C)",
@@ -32,47 +50,161 @@ def prepare_table_view(df: pd.DataFrame):
                        "UVI": "УФ-индекс",
                        "AQI": "Инд. кач-ва возд.",
                        "conditions": "Условия"
-                       })
+                       }
+
+def prepare_table_view(df: pd.DataFrame):
+    # Категории и целые с пропусками не принимают '-', поэтому таблица строится по объектам
+    df = df.astype(object).fillna('-')
+    df = df.rename(columns=TABLE_COLUMN_LABELS)
     return df
 
-def populate_page_data(filter_date:str = None, settings: SettingsManager = None):
+def filter_date_range(filter_date: str):
+    # Фильтр задаёт год, месяц или день: 2025, 2025-06 или 2025-06-11
+    for date_format, length in (("%Y-%m-%d", 10), ("%Y-%m", 7), ("%Y", 4)):
+        if len(filter_date) != length:
+            continue
+        date_from = datetime.datetime.strptime(filter_date, date_format)
+        if length == 10:
+            date_to = date_from + datetime.timedelta(days=1)
+        elif length == 7:
+            date_to = (date_from + datetime.timedelta(days=32)).replace(day=1)
+        else:
+            date_to = date_from.replace(year=date_from.year + 1)
+        return date_from, date_to
+    raise ValueError(f"Неверный формат даты '{filter_date}'")
+
+def parse_date_bound(value: str | None, end: bool = False):
+    if not value:
+        return None
+    try:
+        bound = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Неверный формат даты '{value}'")
+    # Дата без времени в правой границе включает весь день
+    if end and len(value) == 10:
+        bound += datetime.timedelta(days=1)
+    return bound
+
+def page_cursor(row) -> str:
+    # Курсор таблицы — ключ последней отданной строки: время, источник и город через «|»
+    city = row.get("city")
+    city = "" if pd.isna(city) else str(city)
+    return "|".join([row["timestamp"].isoformat(), str(row["source"]), city])
+
+def parse_page_cursor(value: str | None) -> tuple | None:
+    if not value:
+        return None
+    timestamp, *key = value.split("|", 2)
+    # Курсор прежнего формата содержит только время
+    if len(key) != 2:
+        return parse_date_bound(timestamp), None, None
+    return parse_date_bound(timestamp), key[0], key[1]
+
+def tracked_cities(settings: dict) -> list:
+    # Раньше в настройках хранился один город строкой
+    cities = settings.get("city", [])
+    if isinstance(cities, str):
+        cities = cities.split(",")
+    return [city.strip() for city in cities if city and city.strip()]
+
+def parse_cursor(store, since: str | None) -> int | None:
+    # Курсор /data — версия хранилища «эпоха-поколение». Курсор прошлого запуска приложения
+    # или прежнего формата (время последней строки) даёт полный ответ
+    epoch, _, generation = (since or "").rpartition("-")
+    if epoch != store.epoch or not generation.isdigit():
+        return None
+    return int(generation)
+
+def rows_since(store, index, generation: int | None, date_from, date_to, city: str | None) -> pd.DataFrame | None:
+    # Строки, записанные после курсора клиента, если их можно дописать к тому, что у него уже есть; иначе None
+    if generation is None:
+        return None
+    rows = store.changes_since(generation, index.generation)
+    if rows is None:
+        return None
+    if rows.empty:
+        return index.df.iloc[0:0]
+    if city is not None:
+        rows = rows[rows["city"] == city]
+    if date_from is not None:
+        rows = rows[(rows["timestamp"] >= date_from) & (rows["timestamp"] < date_to)]
+    # В выбранном периоде может не быть ни одной секции: тогда у выборки нет даже колонок
+    if rows.empty or "timestamp" not in index.df.columns:
+        return index.df.iloc[0:0]
+    rows = apply_schema(rows.reindex(columns=index.df.columns).sort_values(by="timestamp", kind="stable", ignore_index=True))
+    # Пакет, записанный позже, может содержать строки старше уже отданных клиенту: в конец графика и таблицы
+    # их не дописать, поэтому тогда клиент получает полный ответ
+    earliest = rows["timestamp"].iloc[0]
+    if len(index.positions(after=earliest, city=city)) > (rows["timestamp"] > earliest).sum():
+        return None
+    return rows
+
+def populate_page_data(filter_date:str = None, settings: SettingsManager = None, since: str = None, max_points: int = None, city: str = None,
+                       with_series: bool = True):
     df = None
-    series_by_source = defaultdict(list)
+    series_by_source = {}
     
     settings = settings or SettingsManager().load_settings()
-    city = settings.get("city", "")
-    CURRENT_DB_FILENAME = settings.get("weather_current_database")
-
-    if os.path.exists(CURRENT_DB_FILENAME):
-        df = pd.read_excel(CURRENT_DB_FILENAME)
-        if filter_date and "timestamp" in df.columns:
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-            df = df[df["timestamp"].dt.strftime("%Y-%m-%d").str.startswith(filter_date)]
-
-        for _, row in df.iterrows():
-            source = row.get("source")
-            temp = row.get("T0")
-            date = row.get("timestamp")
-
-            if pd.notnull(source) and pd.notnull(temp) and pd.notnull(date):
-                iso_time = pd.to_datetime(date).isoformat()
-                series_by_source[source].append({
-                    "x": iso_time,
-                    "y": float(temp)
-                })
-        df = df.sort_values(by='timestamp',ascending=False)
-        df = prepare_table_view(df)
+    cities = tracked_cities(settings)
+    store = get_store(settings.get("weather_current_database"), **storage_options(settings))
+
+    date_from = date_to = None
+    if filter_date:
+        try:
+            date_from, date_to = filter_date_range(filter_date)
+        except ValueError as e:
+            print("Ошибка фильтра по дате:", e)
+    # Между записями планировщика история берётся из кэша; при промахе читаются только нужные секции
+    index = report_cache.read_index(store, date_from, date_to)
+    # Без выбранного города показываются все отслеживаемые
+    df = index.select(city=city)
+    # Курсор — поколение выборки, а не время последней строки: строки пишутся пакетами по окончании сбора города,
+    # и пакет, записанный позже, может оказаться старше уже отданных строк
+    cursor = f"{store.epoch}-{index.generation}"
+    new_rows = rows_since(store, index, parse_cursor(store, since), date_from, date_to, city) if since else None
+    # Если новых строк больше страницы, клиенту проще заново получить первую страницу;
+    # тогда график и таблица строятся по всей истории, потому что клиент заменит их целиком
+    incremental = new_rows is not None and len(new_rows) <= TABLE_PAGE_SIZE
+    if incremental:
+        df = new_rows
+    if not df.empty and "timestamp" in df.columns:
+        # Серии строятся по колонкам целиком и прореживаются до max_points точек на источник
+        if with_series:
+            series_by_source = build_series(df, max_points)
+        # История в кэше упорядочена по времени, в таблицу попадает только последняя страница.
+        # Строки с тем же временем, что и последняя строка страницы, упорядочиваются по ключу, как в /rows
+        page = df.iloc[::-1].head(TABLE_PAGE_SIZE)
+        table_cursor = None
+        if len(df) > TABLE_PAGE_SIZE:
+            page = page_order(df.iloc[df["timestamp"].searchsorted(page["timestamp"].iloc[-1], side="left"):]).head(TABLE_PAGE_SIZE)
+            table_cursor = page_cursor(page.iloc[-1])
+        else:
+            page = page_order(page)
+        page = prepare_table_view(page)
         return {
-            "table": df.to_html(index=False, classes="table table-striped table-bordered table-hover align-middle"),
-            "series": dict(series_by_source),
-            'default_city': city,
+            "table": page.to_html(index=False, classes="table table-striped table-bordered table-hover align-middle"),
+            "table_cursor": table_cursor,
+            "series": series_by_source,
+            "city": city,
+            "cities": cities,
+            "cursor": cursor,
+            "incremental": incremental,
         }
     return {
-        "table": "<p>Нет данных</p>",
-        "series": dict(series_by_source),
-        "default_city": city,
+        "table": "" if incremental else "<p>Нет данных</p>",
+        "table_cursor": None,
+        "series": series_by_source,
+        "city": city,
+        "cities": cities,
+        "cursor": cursor,
+        "incremental": incremental,
     }
 
+def data_etag(store, *params):
+    # Сильный ETag: версия хранилища меняется после каждой записи, параметры запроса различают представления
+    digest = hashlib.md5("|".join(str(param) for param in params).encode("utf-8")).hexdigest()[:12]
+    return f'"{store.version}-{digest}"'
+
 def is_tracking_active(settings: SettingsManager = None):
     settings = settings or SettingsManager().load_settings()
     tracking_start = settings.get("tracking_start")
@@ -87,57 +219,244 @@ def is_tracking_active(settings: SettingsManager = None):
     return False
 
 
-def update_weather_data(settings: SettingsManager = None): 
+def update_weather_data(settings: SettingsManager = None, cities: list = None): 
     settings = settings or SettingsManager().load_settings()
-    city = settings.get("city","")
+    cities = cities or tracked_cities(settings)
     CURRENT_WEATHER_FILENAME = settings.get("weather_current_database")
     FORECAST_WEATHER_FILENAME = settings.get("weather_forecast_database")
     
     tracking_active = is_tracking_active(settings)
     if tracking_active:
-        aggregator = WeatherAggregator(db_current_weather=CURRENT_WEATHER_FILENAME, db_forecast_weather=FORECAST_WEATHER_FILENAME)
-        df_current_new = aggregator.collect_current_data(city)
-        df_forecast_new = aggregator.collect_forecast_data(city)
+        aggregator = WeatherAggregator(db_current_weather=CURRENT_WEATHER_FILENAME, 
+                                       db_forecast_weather=FORECAST_WEATHER_FILENAME,
+                                       storage_options=storage_options(settings),
+                                       provider_deadline=settings.get("provider_deadline", 45),
+                                       tick_budget=settings.get("tick_budget", 90),
+                                       provider_deadlines=settings.get("provider_deadlines", {}),
+                                       providers=provider_pool.get(settings))
+        df_current_new, df_forecast_new = aggregator.collect_data(cities)
         aggregator.append_to_current_report(df_current_new)
         aggregator.append_to_forecast_report(df_forecast_new)
 
 
+def maintain_weather_storage(settings: SettingsManager = None):
+    settings = settings or SettingsManager().load_settings()
+    retention_days = settings.get("storage_retention_days", 0)
+    archive = settings.get("storage_retention_action", "archive") == "archive"
+    for database in (settings.get("weather_current_database"), settings.get("weather_forecast_database")):
+        store = get_store(database, **storage_options(settings))
+        store.compact()
+        store.apply_retention(retention_days, archive)
+
+
+def configure_collection_executor(workers: int):
+    # Пул пересоздаётся при смене настроек; задачи прежнего пула дорабатывают без ожидания
+    global collection_executor
+    if collection_executor is not None:
+        scheduler.remove_executor(COLLECTION_EXECUTOR, shutdown=False)
+        collection_executor.shutdown(wait=False)
+    collection_executor = ThreadPoolExecutor(workers)
+    scheduler.add_executor(collection_executor, COLLECTION_EXECUTOR)
+
 def start_scheduler():
     settings = SettingsManager().load_settings()
+    # Кэш городов читается с диска при запуске, чтобы первые же тики обходились без поиска
+    location_cache.configure(settings.get("location_cache_file", "location_cache.json"),
+                             settings.get("location_cache_ttl", 30 * 24 * 3600),
+                             settings.get("location_cache_negative_ttl", 3600))
+    rate_limiter.configure(settings.get("rate_limits", {}))
+    http_cache.configure(settings.get("http_cache_dir", "http_cache"), settings.get("http_cache_max_mb", 64) * 1024 * 1024)
+    html_parser.configure(settings.get("html_parser", "auto"))
+    circuit_breakers.configure(settings.get("circuit_failure_threshold", 3),
+                               settings.get("circuit_provider_failure_threshold", 5),
+                               settings.get("circuit_backoff", 30),
+                               settings.get("circuit_max_backoff", 1800))
+    browser_pool.configure(settings.get("browser_driver", "chrome"),
+                           settings.get("browser_pool_size", 1),
+                           settings.get("browser_max_pages", 50),
+                           settings.get("browser_max_age", 3600),
+                           settings.get("browser_page_timeout", 20))
+    fetch_limits.configure(settings.get("max_concurrency", 6),
+                           settings.get("provider_concurrency", 2),
+                           settings.get("provider_concurrencies", {}))
     interval = settings.get("server_interval", 10)
     if scheduler.running:
         scheduler.remove_all_jobs()
     else:
         scheduler.start()
-    scheduler.add_job(update_weather_data, 'interval', seconds=interval, id="weather_update", replace_existing=True)
+    # Пул провайдеров пересоздаётся, если изменились параметры соединений
+    provider_pool.get(settings)
+    # У каждого города своя задача, первые запуски равномерно разнесены по интервалу, чтобы запросы не шли залпом
+    cities = tracked_cities(settings)
+    spacing = interval / max(1, len(cities))
+    now = datetime.datetime.now()
+    # Одновременных запросов не больше max_concurrency, но задача, ждущая свободного места, тоже занимает поток:
+    # потоков по числу городов, чтобы запуск одного города не ждал окончания тиков других и не пропускался
+    configure_collection_executor(max(len(cities), 1))
+    for i, city in enumerate(cities):
+        first_run = now + datetime.timedelta(seconds=spacing * (i + 1))
+        # Опоздавший запуск выполняется, если опоздал меньше чем на интервал; несколько пропущенных сливаются в один,
+        # а новый запуск города не начинается, пока не закончился предыдущий
+        scheduler.add_job(update_weather_data, 'interval', seconds=interval, start_date=first_run,
+                          kwargs={"cities": [city]}, id=f"weather_update_{i}", replace_existing=True,
+                          executor=COLLECTION_EXECUTOR, misfire_grace_time=interval, coalesce=True, max_instances=1)
+    if cities and settings.get("connection_warmup", False):
+        # Соединения с провайдерами открываются раз за интервал сбора, за connection_warmup_lead секунд до первого города;
+        # хосты, с которыми в пуле уже есть живое соединение, пропускаются
+        lead = min(settings.get("connection_warmup_lead", 5), spacing)
+        scheduler.add_job(provider_pool.warm_up, 'interval', seconds=interval, args=[settings],
+                          start_date=now + datetime.timedelta(seconds=spacing - lead), id="connection_warmup", replace_existing=True)
+    # Слияние мелких секций и очистка по сроку хранения выполняются в фоне
+    maintenance_interval = settings.get("storage_maintenance_interval", 3600)
+    scheduler.add_job(maintain_weather_storage, 'interval', seconds=maintenance_interval, id="storage_maintenance", replace_existing=True)
 
 @app.get("/", response_class=HTMLResponse)
-async def get_form(request: Request, filter_date: str = None):
-    data_dict = populate_page_data(filter_date=filter_date)
+async def get_form(request: Request, filter_date: str = None, city: str = None):
+    # График страницы заполняется запросом /data, серии для шаблона не нужны
+    data_dict = populate_page_data(filter_date=filter_date, city=city or None, with_series=False)
     data_dict['request'] = request
     return templates.TemplateResponse("form.html", data_dict)
 
 @app.get("/data", response_class=JSONResponse)
-async def get_weather_table():
-    data_dict = populate_page_data()
-    return data_dict
+async def get_weather_table(request: Request, since: str = None, max_points: int = Query(None, ge=3), filter_date: str = None, city: str = None):
+    settings = SettingsManager().load_settings()
+    store = get_store(settings.get("weather_current_database"), **storage_options(settings))
+    etag = data_etag(store, since, max_points, filter_date, city, tracked_cities(settings))
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    data_dict = populate_page_data(filter_date=filter_date, settings=settings, since=since, max_points=max_points, city=city or None)
+    return JSONResponse(data_dict, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/rows", response_class=JSONResponse)
+async def get_weather_rows(limit: int = Query(TABLE_PAGE_SIZE, ge=1, le=500),
+                           cursor: str = None,
+                           columns: str = None,
+                           filter_date: str = None,
+                           date_from: str = Query(None, alias="from"),
+                           date_to: str = Query(None, alias="to"),
+                           source: str = None,
+                           city: str = None):
+    settings = SettingsManager().load_settings()
+    store = get_store(settings.get("weather_current_database"), **storage_options(settings))
+    date_from, date_to = parse_date_bound(date_from), parse_date_bound(date_to, end=True)
+    if filter_date:
+        try:
+            date_from, date_to = filter_date_range(filter_date)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    projection = [column.strip() for column in columns.split(",") if column.strip()] if columns else None
+    # Запрашиваем на одну строку больше, чтобы понять, есть ли следующая страница
+    df = store.read_page(limit + 1, before=parse_page_cursor(cursor), columns=projection,
+                         date_from=date_from, date_to=date_to, source=source or None, city=city or None)
+    next_cursor = page_cursor(df.iloc[limit - 1]) if len(df) > limit else None
+    df = df.head(limit)
+    if "timestamp" in df.columns:
+        df = df.assign(timestamp=df["timestamp"].astype(str))
+    if projection:
+        df = df[[column for column in projection if column in df.columns]]
+    df = df.astype(object).where(df.notna(), None)
+    return {
+        "columns": list(df.columns),
+        "labels": [TABLE_COLUMN_LABELS.get(column, column) for column in df.columns],
+        "rows": df.values.tolist(),
+        "next_cursor": next_cursor,
+    }
+
+@app.get("/rollups", response_class=JSONResponse)
+async def get_weather_rollups(period: str = "hour",
+                              date_from: str = Query(None, alias="from"),
+                              date_to: str = Query(None, alias="to"),
+                              source: str = None,
+                              city: str = None):
+    settings = SettingsManager().load_settings()
+    store = get_store(settings.get("weather_current_database"), **storage_options(settings))
+    try:
+        df = store.read_rollups(period, parse_date_bound(date_from), parse_date_bound(date_to, end=True), source or None, city or None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if df.empty:
+        return {"period": period, "rollups": []}
+    df = df.assign(bucket=df["bucket"].map(lambda bucket: bucket.isoformat()))
+    df = df.astype(object).where(df.notna(), None)
+    return {"period": period, "rollups": df.to_dict(orient="records")}
+
+@app.get("/location-cache", response_class=JSONResponse)
+async def get_location_cache():
+    return location_cache.stats()
+
+@app.delete("/location-cache", response_class=JSONResponse)
+async def invalidate_location_cache(provider: str = None, city: str = None):
+    return {"removed": location_cache.invalidate(provider or None, city or None)}
+
+@app.get("/http-cache", response_class=JSONResponse)
+async def get_http_cache():
+    return http_cache.stats()
+
+@app.delete("/http-cache", response_class=JSONResponse)
+async def clear_http_cache():
+    http_cache.clear()
+    return http_cache.stats()
+
+@app.get("/circuit-breakers", response_class=JSONResponse)
+async def get_circuit_breakers():
+    return circuit_breakers.stats()
+
+@app.delete("/circuit-breakers", response_class=JSONResponse)
+async def reset_circuit_breakers(provider: str = None):
+    return {"reset": circuit_breakers.reset(provider or None)}
+
+@app.get("/browser-pool", response_class=JSONResponse)
+async def get_browser_pool():
+    return browser_pool.stats()
 
 @app.get("/tracking-status", response_class=JSONResponse)
 async def get_weather_table():
     return {"tracking_status": is_tracking_active()}
 
+def export_report(database: str, settings: SettingsManager, format: str, filters: dict):
+    store = get_store(database, **storage_options(settings))
+    if format == "csv":
+        return StreamingResponse(iter_csv(store, **filters), 
+                                 media_type="text/csv; charset=utf-8",
+                                 headers={"Content-Disposition": f'attachment; filename="{store.export_filename("csv")}"'})
+    if format != "xlsx":
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат выгрузки '{format}'")
+    # Отчёт собирается во временный файл, который удаляется после отправки
+    fd, export_filename = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    write_xlsx(store, export_filename, **filters)
+    return FileResponse(export_filename, 
+                        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
+                        filename=store.export_filename("xlsx"),
+                        background=BackgroundTask(os.remove, export_filename))
+
+def export_filters(date_from: str | None, date_to: str | None, source: str | None, city: str | None):
+    return {
+        "date_from": parse_date_bound(date_from),
+        "date_to": parse_date_bound(date_to, end=True),
+        "source": source or None,
+        "city": city or None,
+    }
+
 @app.get("/download_current")
-async def download_report_current():
+async def download_report_current(format: str = "xlsx",
+                                  date_from: str = Query(None, alias="from"),
+                                  date_to: str = Query(None, alias="to"),
+                                  source: str = None,
+                                  city: str = None):
     settings = SettingsManager().load_settings()
-    DB_CURRENT = settings.get("weather_current_database")
-    DB_FORECAST = settings.get("weather_forecast_database")
-    return FileResponse(DB_CURRENT, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', filename=DB_CURRENT)
+    filters = export_filters(date_from, date_to, source, city)
+    return await run_in_threadpool(export_report, settings.get("weather_current_database"), settings, format, filters)
 
 @app.get("/download_forecast")
-async def download_report_forecast():
+async def download_report_forecast(format: str = "xlsx",
+                                   date_from: str = Query(None, alias="from"),
+                                   date_to: str = Query(None, alias="to"),
+                                   source: str = None,
+                                   city: str = None):
     settings = SettingsManager().load_settings()
-    DB_FORECAST = settings.get("weather_forecast_database")
-    return FileResponse(DB_FORECAST, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', filename=DB_FORECAST)
+    filters = export_filters(date_from, date_to, source, city)
+    return await run_in_threadpool(export_report, settings.get("weather_forecast_database"), settings, format, filters)
 
 @app.get("/settings", response_class=HTMLResponse)
 async def settings_page(request: Request):
@@ -155,19 +474,23 @@ async def save_user_settings(request: Request,
     if tracking_start_at:
         tracking_start_at = tracking_start_at.replace("T", " ")
     if not db_current_filename:
-        db_current_filename = "weather_report_current.xlsx"
+        db_current_filename = "weather_report_current"
     if not db_forecast_filename:
-        db_forecast_filename = "weather_report_forecast.xlsx"
-        
-    SettingsManager().save_settings(
+        db_forecast_filename = "weather_report_forecast"
+    
+    # Сохраняем параметры, которых нет в форме (например, тип хранилища)
+    settings = SettingsManager().load_settings()
+    settings.update(
         {
-            "city": city, 
+            # Города вводятся через запятую
+            "city": tracked_cities({"city": city}), 
             "interval": interval, 
             "tracking_start": tracking_start_at, 
             "weather_current_database":db_current_filename, 
             "weather_forecast_database":db_forecast_filename, 
             "server_interval": server_interval
         })
+    SettingsManager().save_settings(settings)
     
     start_scheduler()
     
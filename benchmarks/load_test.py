@@ -0,0 +1,135 @@
+import argparse, contextlib, io, os, statistics, tempfile, time
+from app import update_weather_data, scheduler
+from settings import SettingsManager
+from weather_aggregator import fetch_limits, provider_pool
+from providers.location_cache import location_cache
+from providers.rate_limiter import rate_limiter
+from providers.http_cache import http_cache
+from providers.browser_pool import browser_pool
+from benchmarks.stand_in import StandInServer, Recordings, RECORDINGS_DIR
+
+# Нагрузочное испытание сбора: тики update_weather_data для сотен городов против локальной подмены сайтов.
+# Хранилище, кэш городов и HTTP-кэш создаются во временном каталоге, рабочие данные не затрагиваются.
+# Запуск из корня проекта: python -m benchmarks.load_test --cities 10,100 --concurrency 6,24
+
+# Импорт приложения запускает планировщик с рабочими городами: в испытании тики запускаются только отсюда
+scheduler.shutdown(wait=False)
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+class LatencyRecorder:
+    # Время каждого запроса провайдеров со стороны клиента, включая ожидание ограничителя и пула соединений
+    def __init__(self):
+        self.latencies = []
+        self._hooked = set()
+
+    def attach(self, providers: list):
+        for provider in providers:
+            if id(provider.session) not in self._hooked:
+                # Перед проверкой статуса, чтобы учитывались и ответы с ошибкой
+                provider.session.hooks["response"].insert(0, self._record)
+                self._hooked.add(id(provider.session))
+
+    def _record(self, response, *args, **kwargs):
+        self.latencies.append(response.elapsed.total_seconds() * 1000)
+
+def load_settings(workdir: str, stand_in: str, concurrency: int, args) -> dict:
+    settings = SettingsManager().load_settings()
+    return {
+        **settings,
+        "tracking_start": "2000-01-01 00:00",
+        "weather_current_database": os.path.join(workdir, "weather_report_current"),
+        "weather_forecast_database": os.path.join(workdir, "weather_report_forecast"),
+        "provider_stand_in": stand_in,
+        "provider_deadline": args.tick_budget,
+        "provider_deadlines": {},
+        # Провайдер с браузером занимает не больше потоков, чем браузеров в пуле, как в settings.json
+        "provider_concurrencies": {"RP5Provider": args.browsers},
+        "tick_budget": args.tick_budget,
+        "http_pool_connections": 10,
+        "http_pool_maxsize": max(10, concurrency),
+    }
+
+def run_tick(settings: dict, cities: list, verbose: bool) -> float:
+    started = time.perf_counter()
+    if verbose:
+        update_weather_data(settings, cities)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            update_weather_data(settings, cities)
+    return time.perf_counter() - started
+
+def run_scenario(server: StandInServer, workdir: str, city_count: int, concurrency: int, args) -> dict:
+    settings = load_settings(workdir, server.url, concurrency, args)
+    fetch_limits.configure(concurrency, args.provider_concurrency or concurrency, settings["provider_concurrencies"])
+    recorder = LatencyRecorder()
+    recorder.attach(provider_pool.get(settings))
+    cities = [f"Город {i + 1}" for i in range(city_count)]
+    # Первый тик ищет города; в замер идут следующие, как в установившемся режиме
+    run_tick(settings, cities, args.verbose)
+    server.reset()
+    recorder.latencies.clear()
+    durations = [run_tick(settings, cities, args.verbose) for _ in range(args.ticks)]
+    stats = server.stats()
+    latencies = recorder.latencies
+    return {
+        "cities": city_count,
+        "concurrency": concurrency,
+        "ticks_per_s": len(durations) / sum(durations),
+        "tick_s": statistics.mean(durations),
+        "requests_per_tick": stats["requests"] / len(durations),
+        "errors_per_tick": stats["errors"] / len(durations),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": max(latencies, default=0.0),
+    }
+
+def print_row(result: dict):
+    print(f"{result['cities']:7d} {result['concurrency']:9d} {result['ticks_per_s']:9.3f} {result['tick_s']:9.2f} "
+          f"{result['requests_per_tick']:11.1f} {result['errors_per_tick']:8.1f} "
+          f"{result['p50_ms']:8.1f} {result['p95_ms']:8.1f} {result['p99_ms']:8.1f} {result['max_ms']:8.1f}")
+
+def int_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочное испытание сбора данных на локальной подмене сайтов")
+    parser.add_argument("--cities", type=int_list, default=[10, 50, 100], help="числа городов через запятую")
+    parser.add_argument("--concurrency", type=int_list, default=[6, 12, 24], help="значения max_concurrency через запятую")
+    parser.add_argument("--provider-concurrency", type=int, default=0, help="provider_concurrency (0 — равен max_concurrency)")
+    parser.add_argument("--ticks", type=int, default=3, help="замеряемых тиков на сценарий")
+    parser.add_argument("--tick-budget", type=float, default=600, help="бюджет тика и срок провайдера, с")
+    parser.add_argument("--latency-ms", type=float, default=150, help="задержка ответа подмены, мс")
+    parser.add_argument("--jitter-ms", type=float, default=100, help="случайная добавка к задержке, мс")
+    parser.add_argument("--error-rate", type=float, default=0, help="доля ответов 503")
+    parser.add_argument("--host-rate", type=float, default=0, help="пропускная способность сайта, запросов в секунду (0 — без ограничения)")
+    parser.add_argument("--host-burst", type=int, default=1)
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="включить ограничитель из settings.json (все сайты подмены — один хост, поэтому по умолчанию он выключен)")
+    parser.add_argument("--browsers", type=int, default=1, help="браузеров в пуле (страницы RP5 загружает FakeDriver через подмену)")
+    parser.add_argument("--recordings", default=RECORDINGS_DIR, help="каталог записей подмены")
+    parser.add_argument("--verbose", action="store_true", help="не скрывать журнал сбора")
+    args = parser.parse_args()
+
+    server = StandInServer(recordings=Recordings(args.recordings), latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                           error_rate=args.error_rate, host_rate=args.host_rate, host_burst=args.host_burst).start()
+    with tempfile.TemporaryDirectory(prefix="weather-load-") as workdir:
+        location_cache.configure(os.path.join(workdir, "location_cache.json"))
+        http_cache.configure(os.path.join(workdir, "http_cache"))
+        browser_pool.configure("fake", args.browsers)
+        rate_limiter.configure(SettingsManager().load_settings().get("rate_limits", {}) if args.rate_limits
+                               else {"default": {"rate": 1e9, "burst": 1e9, "jitter": 0}})
+        print(f"Подмена сайтов: {server.url}")
+        print(f"{'городов':>7s} {'потоков':>9s} {'тиков/с':>9s} {'тик, с':>9s} {'запросов/тик':>11s} {'ошибок':>8s} "
+              f"{'p50, мс':>8s} {'p95, мс':>8s} {'p99, мс':>8s} {'max, мс':>8s}")
+        try:
+            for city_count in args.cities:
+                for concurrency in args.concurrency:
+                    print_row(run_scenario(server, workdir, city_count, concurrency, args))
+        finally:
+            server.stop()
@@ -0,0 +1,197 @@
+import argparse, json, os, statistics, sys, time, tracemalloc
+from requests import Response
+from providers.html_parser import html_parser, backend_available, PARSER_BACKENDS
+from providers.yandexweather_provider import YandexWeatherProvider
+from providers.gismeteo_provider import GismeteoProvider
+from providers.accuweather_provider import AccuWeatherProvider
+from providers.rp5_provider import RP5Provider
+from providers.browser_pool import BrowserPool, FakeDriver
+from providers.rate_limiter import rate_limiter
+
+# Замер разбора страниц провайдеров без сети: страницы берутся из fixtures/, сессия провайдера подменяется.
+# Запуск из корня проекта: python -m benchmarks.parse_benchmark
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCHMARK_DIR, "fixtures")
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline.json")
+CITY = "Екатеринбург"
+
+# Фрагмент адреса -> файл страницы; проверяются по порядку, поэтому более общие фрагменты идут последними
+ROUTES = {
+    YandexWeatherProvider: [
+        ("/weather/api/suggest", "yandex_suggest.json"),
+        ("/pollution", "yandex_pollution.html"),
+        ("/details/3-day-weather", "yandex_forecast.html"),
+        ("/pogoda/ru/", "yandex_current.html"),
+    ],
+    GismeteoProvider: [
+        ("/mq/city/q/", "gismeteo_city.json"),
+        ("/now", "gismeteo_now.html"),
+        ("/3-days", "gismeteo_3days.html"),
+    ],
+    AccuWeatherProvider: [
+        ("/web-api/autocomplete", "accuweather_autocomplete.json"),
+        ("/web-api/three-day-redirect", "accuweather_redirect.html"),
+        ("/air-quality-index/", "accuweather_air_quality.html"),
+        ("/weather-tomorrow/", "accuweather_tomorrow.html"),
+        ("/current-weather/", "accuweather_current.html"),
+    ],
+    RP5Provider: [
+        ("/Погода_в_", "rp5_current.html"),
+    ],
+}
+
+# Страница -> провайдер, её области и описание полей (None — страница только разбирается)
+PAGES = [
+    ("yandex_current.html", YandexWeatherProvider, "CURRENT_REGIONS", "CURRENT_FIELDS"),
+    ("yandex_pollution.html", YandexWeatherProvider, "POLLUTION_REGIONS", "POLLUTION_FIELDS"),
+    ("yandex_forecast.html", YandexWeatherProvider, "FORECAST_REGIONS", "FORECAST_FIELDS"),
+    ("gismeteo_now.html", GismeteoProvider, "CURRENT_REGIONS", "CURRENT_FIELDS"),
+    ("gismeteo_3days.html", GismeteoProvider, "FORECAST_REGIONS", "FORECAST_FIELDS"),
+    ("accuweather_redirect.html", AccuWeatherProvider, "REDIRECT_REGIONS", None),
+    ("accuweather_current.html", AccuWeatherProvider, "CURRENT_REGIONS", "CURRENT_FIELDS"),
+    ("accuweather_air_quality.html", AccuWeatherProvider, "AIR_QUALITY_REGIONS", "AIR_QUALITY_FIELDS"),
+    ("accuweather_tomorrow.html", AccuWeatherProvider, "FORECAST_REGIONS", "FORECAST_FIELDS"),
+    ("rp5_current.html", RP5Provider, "CURRENT_REGIONS", "CURRENT_FIELDS"),
+]
+
+# Допустимый рост метрик относительно базовой линии и абсолютный порог, ниже которого разница считается шумом
+TIME_TOLERANCE = 0.25
+MEMORY_TOLERANCE = 0.10
+NOISE_FLOOR = {"ms": 1.0, "peak_kb": 16, "blocks": 100}
+CHECKED_METRICS = ("ms", "peak_kb", "blocks")
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+class FixtureSession:
+    # Вместо requests.Session провайдера: ответы собираются из записанных страниц
+    def __init__(self, routes: list):
+        self.routes = routes
+        self.cache = {}
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        for fragment, name in self.routes:
+            if fragment in url:
+                if name not in self.cache:
+                    self.cache[name] = read_fixture(name)
+                response = Response()
+                response.status_code = 200
+                response._content = self.cache[name]
+                response.encoding = "utf-8"
+                response.url = url
+                return response
+        raise KeyError(f"Для адреса {url} нет записанной страницы")
+
+def offline_provider(provider_class):
+    provider = provider_class()
+    provider.session = FixtureSession(ROUTES[provider_class])
+    if hasattr(provider, "browsers"):
+        # Браузер заменяется FakeDriver с теми же записанными страницами
+        provider.browsers = BrowserPool("fake", factory=lambda timeout: FakeDriver(timeout, lambda url: provider.session.get(url).text))
+    return provider
+
+def measure(stage, repeat: int) -> dict:
+    # Лучшее и медианное время, пик памяти Python за один проход и число блоков памяти, которые держит результат разбора.
+    # Регрессии проверяются по лучшему времени: оно меньше всего зависит от посторонней нагрузки на машину.
+    # Память библиотеки libxml2 (бэкенд lxml) tracemalloc не видит, в пик попадают только объекты Python
+    stage()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stage()
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = stage()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+        del result
+    finally:
+        tracemalloc.stop()
+    return {"ms": round(min(timings), 3), "median_ms": round(statistics.median(timings), 3), "peak_kb": round(peak / 1024, 1), "blocks": blocks}
+
+def page_stage(provider, markup: str, regions_name: str, fields_name: str):
+    regions = getattr(provider, regions_name)
+    if fields_name is None:
+        return lambda: provider.parse_html(markup, regions)
+    fields = getattr(provider, fields_name)
+    # Дерево возвращается вместе с полями, чтобы замер блоков учитывал и его
+    return lambda: (document := provider.parse_html(markup, regions), fields.extract(document, provider.provider_name))
+
+def provider_stage(provider, location):
+    return lambda: (provider.fetch(CITY, location=location), provider.fetch_forecast(CITY, location=location))
+
+def run(backends: list, repeat: int) -> dict:
+    # Провайдеры с браузером соблюдают паузы ограничителя сами, а не через адаптер сессии: в замере пауз нет
+    rate_limiter.configure({"default": {"rate": 1e9, "burst": 1e9, "jitter": 0}})
+    results = {}
+    for backend in backends:
+        html_parser.configure(backend)
+        results[backend] = {}
+        providers = {provider_class: offline_provider(provider_class) for provider_class in ROUTES}
+        for name, provider_class, regions_name, fields_name in PAGES:
+            markup = read_fixture(name).decode("utf-8")
+            results[backend][name] = measure(page_stage(providers[provider_class], markup, regions_name, fields_name), repeat)
+        for provider_class, provider in providers.items():
+            location = provider.resolve_location(CITY)
+            results[backend][provider_class.__name__] = measure(provider_stage(provider, location), repeat)
+    return results
+
+def regressions(results: dict, baseline: dict, time_tolerance: float) -> list:
+    found = []
+    for backend, entries in results.items():
+        for name, metrics in entries.items():
+            reference = baseline.get(backend, {}).get(name)
+            if not reference:
+                continue
+            for metric in CHECKED_METRICS:
+                value, base = metrics[metric], reference.get(metric)
+                if base is None:
+                    continue
+                tolerance = time_tolerance if metric == "ms" else MEMORY_TOLERANCE
+                if value > base * (1 + tolerance) and value - base > NOISE_FLOOR[metric]:
+                    found.append(f"{backend} {name} {metric}: {base} -> {value}")
+    return found
+
+def print_report(results: dict, baseline: dict):
+    print(f"{'бэкенд':12s} {'страница':32s} {'мс':>9s} {'медиана':>9s} {'пик КБ':>9s} {'блоков':>8s} {'мс (база)':>10s}")
+    for backend, entries in results.items():
+        for name, metrics in entries.items():
+            reference = baseline.get(backend, {}).get(name, {})
+            base = f"{reference['ms']:10.2f}" if "ms" in reference else f"{'—':>10s}"
+            print(f"{backend:12s} {name:32s} {metrics['ms']:9.2f} {metrics['median_ms']:9.2f} {metrics['peak_kb']:9.1f} {metrics['blocks']:8d} {base}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замер разбора страниц провайдеров на записанных страницах")
+    parser.add_argument("--backend", action="append", choices=PARSER_BACKENDS, help="бэкенд парсера (по умолчанию все доступные)")
+    parser.add_argument("--repeat", type=int, default=20, help="число повторов для медианы времени")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="допустимый рост времени относительно базовой линии")
+    parser.add_argument("--save-baseline", action="store_true", help="сохранить результаты как базовую линию")
+    args = parser.parse_args()
+
+    backends = args.backend or [backend for backend in PARSER_BACKENDS if backend_available(backend)]
+    results = run(backends, args.repeat)
+    baseline = {}
+    if os.path.exists(BASELINE_FILE):
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        # Бэкенды, которые в этот раз не замерялись, сохраняются из прежней базовой линии
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump({**baseline, **results}, f, ensure_ascii=False, indent=2)
+        print(f"Базовая линия сохранена в {BASELINE_FILE}")
+    elif baseline:
+        found = regressions(results, baseline, args.tolerance)
+        for line in found:
+            print(f"Регрессия: {line}")
+        if found:
+            sys.exit(1)
+        print("Регрессий относительно базовой линии нет")
+    else:
+        print("Базовой линии нет: сохраните её флагом --save-baseline")
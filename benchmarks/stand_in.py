@@ -0,0 +1,213 @@
+import argparse, hashlib, json, os, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, unquote
+import requests
+from providers.rate_limiter import HostRateLimiter
+from providers.http_cache import DROPPED_HEADERS
+from benchmarks.parse_benchmark import ROUTES, read_fixture
+
+# Локальная подмена сайтов провайдеров для нагрузочных испытаний. Адрес http://хост:порт/{сайт}/{путь}
+# соответствует https://{сайт}/{путь}; провайдеры направляются сюда настройкой provider_stand_in.
+# Запуск из корня проекта: python -m benchmarks.stand_in [--record]
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RECORDINGS_DIR = os.path.join(BENCHMARK_DIR, "recordings")
+
+# Сайт -> маршруты записанных страниц из замера разбора: ими отвечают адреса, которых нет среди записей
+FIXTURE_ROUTES = {urlsplit(provider_class().base_url).hostname: routes for provider_class, routes in ROUTES.items()}
+
+class Recordings:
+    # Записанные ответы сайтов: {sha256}.json с адресом, статусом и заголовками и {sha256}.body с телом
+    def __init__(self, directory: str = RECORDINGS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._by_url = {}
+        self._by_path = {}
+        self.load()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def load(self):
+        if not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json"):
+                key = filename[:-5]
+                with open(os.path.join(self.directory, filename), encoding="utf-8") as f:
+                    url = json.load(f)["url"]
+                self._index(key, url)
+
+    def _index(self, key: str, url: str):
+        parts = urlsplit(url)
+        self._by_url[url] = key
+        # Без строки запроса: страница одного города отвечает на запросы с координатами любого другого
+        self._by_path.setdefault((parts.hostname, parts.path), key)
+
+    def find(self, url: str):
+        # (статус, заголовки, тело) или None
+        parts = urlsplit(url)
+        with self._lock:
+            key = self._by_url.get(url) or self._by_path.get((parts.hostname, parts.path))
+        if key is None:
+            return None
+        base = os.path.join(self.directory, key)
+        with open(f"{base}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(f"{base}.body", "rb") as f:
+            return meta["status"], meta["headers"], f.read()
+
+    def save(self, url: str, status: int, headers: dict, body: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.key(url)
+        base = os.path.join(self.directory, key)
+        with open(f"{base}.body", "wb") as f:
+            f.write(body)
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump({"url": url, "status": status, "headers": headers}, f, ensure_ascii=False, indent=2)
+        with self._lock:
+            self._index(key, url)
+
+class StandInServer:
+    # latency и jitter — задержка ответа в секундах (постоянная часть и случайная добавка), error_rate — доля ответов 503,
+    # host_rate и host_burst — пропускная способность каждого сайта: лишние запросы ждут своей очереди, как у перегруженного сервера
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, recordings: Recordings = None, record: bool = False,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, host_rate: float = 0.0, host_burst: int = 1,
+                 upstream_scheme: str = "https"):
+        self.recordings = recordings or Recordings()
+        self.record = record
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.upstream_scheme = upstream_scheme
+        self.limiter = HostRateLimiter({"default": {"rate": host_rate, "burst": host_burst, "jitter": 0}}) if host_rate > 0 else None
+        self.upstream = requests.Session()
+        self._lock = threading.Lock()
+        self._fixtures = {}
+        self.reset()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.not_found = 0
+            self.by_site = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "not_found": self.not_found, "by_site": dict(self.by_site)}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, site: str, error: bool = False, not_found: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+            self.not_found += not_found
+            self.by_site[site] = self.by_site.get(site, 0) + 1
+
+    def _fixture(self, site: str, url: str):
+        # Фрагменты маршрутов записаны без процентного кодирования (у RP5 в адресе кириллица)
+        url = unquote(url)
+        for fragment, name in FIXTURE_ROUTES.get(site, []):
+            if fragment in url:
+                if name not in self._fixtures:
+                    self._fixtures[name] = read_fixture(name)
+                content_type = "application/json" if name.endswith(".json") else "text/html"
+                return 200, {"Content-Type": f"{content_type}; charset=utf-8"}, self._fixtures[name]
+        return None
+
+    def _fetch_upstream(self, url: str, headers: dict):
+        response = self.upstream.get(url, headers=headers, timeout=30)
+        kept = {name: value for name, value in response.headers.items() if name.lower() not in DROPPED_HEADERS | {"set-cookie"}}
+        self.recordings.save(url, response.status_code, kept, response.content)
+        return response.status_code, kept, response.content
+
+    def respond(self, path: str, headers: dict):
+        # (статус, заголовки, тело) для пути вида /{сайт}/{остаток}
+        site, _, rest = path.lstrip("/").partition("/")
+        url = f"{self.upstream_scheme}://{site}/{rest}"
+        if self.limiter:
+            self.limiter.wait(site)
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self._count(site, error=True)
+            return 503, {"Content-Type": "text/plain; charset=utf-8"}, "Сервис временно недоступен".encode("utf-8")
+        if not rest:
+            # Корень сайта отвечает пустой страницей: на него идёт прогрев соединений
+            answer = 200, {"Content-Type": "text/html; charset=utf-8"}, b""
+        elif self.record:
+            answer = self._fetch_upstream(url, headers)
+        else:
+            answer = self.recordings.find(url) or self._fixture(site, url)
+        if answer is None:
+            self._count(site, not_found=True)
+            return 404, {"Content-Type": "text/plain; charset=utf-8"}, f"Нет записи для {url}".encode("utf-8")
+        self._count(site)
+        return answer
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, with_body: bool):
+                forwarded = {name: value for name, value in self.headers.items() if name.lower() in ("user-agent", "accept", "accept-language")}
+                status, headers, body = server.respond(self.path, forwarded)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._send(True)
+
+            def do_HEAD(self):
+                self._send(False)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная подмена сайтов провайдеров")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--record", action="store_true", help="запрашивать настоящие сайты и записывать ответы")
+    parser.add_argument("--recordings", default=RECORDINGS_DIR, help="каталог записей")
+    parser.add_argument("--latency-ms", type=float, default=0, help="задержка ответа, мс")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="случайная добавка к задержке, мс")
+    parser.add_argument("--error-rate", type=float, default=0, help="доля ответов 503")
+    parser.add_argument("--host-rate", type=float, default=0, help="запросов в секунду на сайт (0 — без ограничения)")
+    parser.add_argument("--host-burst", type=int, default=1, help="запас запросов подряд на сайт")
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, Recordings(args.recordings), args.record, args.latency_ms / 1000, args.jitter_ms / 1000,
+                           args.error_rate, args.host_rate, args.host_burst)
+    print(f"Подмена сайтов провайдеров: {server.url} ({'запись' if args.record else 'воспроизведение'}); provider_stand_in = \"{server.url}\"")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets: индексы точек, сохраняющих форму графика
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        # Вершина треугольника в следующей корзине — её средняя точка
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+    return indices
+
+def build_series(df: pd.DataFrame, max_points: int | None = None) -> dict:
+    series_by_source = {}
+    if df.empty or not {"timestamp", "source", "T0"}.issubset(df.columns):
+        return series_by_source
+    points = pd.DataFrame({
+        "timestamp": pd.to_datetime(df["timestamp"], errors="coerce"),
+        "source": df["source"],
+        "T0": pd.to_numeric(df["T0"], errors="coerce"),
+    }).dropna()
+    for source, group in points.groupby("source", sort=False, observed=True):
+        group = group.sort_values("timestamp", kind="stable")
+        timestamps = group["timestamp"].to_numpy(dtype="datetime64[ms]")
+        temps = group["T0"].to_numpy(dtype=np.float64)
+        if max_points:
+            indices = lttb(timestamps.astype(np.int64).astype(np.float64), temps, max_points)
+            timestamps = timestamps[indices]
+            temps = temps[indices]
+        series_by_source[source] = [{"x": x, "y": y} for x, y in zip(np.datetime_as_string(timestamps).tolist(), temps.tolist())]
+    return series_by_source
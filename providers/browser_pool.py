@@ -0,0 +1,211 @@
+import atexit, threading, time
+from contextlib import contextmanager
+import requests
+from providers.html_parser import html_parser
+
+# Браузеры для сайтов, которые собирают страницу скриптами (RP5). Запуск браузера стоит секунд и сотен МБ,
+# поэтому браузеры живут между тиками в пуле и заменяются после max_pages страниц или через max_age секунд
+
+def chrome_driver(page_load_timeout: float = 20):
+    # selenium нужен только настоящему браузеру: с FakeDriver пул работает и без него
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-extensions")
+    # Картинки провайдерам не нужны: без них страница готова раньше и занимает меньше памяти
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    # get() возвращается после построения DOM, готовность данных проверяет wait_ready
+    options.page_load_strategy = "eager"
+    driver = webdriver.Chrome(options=options)
+    driver.set_page_load_timeout(page_load_timeout)
+    return driver
+
+class FakeDriver:
+    # Подмена браузера для испытаний и нагрузочных тестов: разметка страницы берётся из source(url),
+    # по умолчанию обычным HTTP-запросом (например, к локальной подмене сайтов)
+    def __init__(self, page_load_timeout: float = 20, source=None):
+        self.page_load_timeout = page_load_timeout
+        self.source = source or self._download
+        self.current_url = "about:blank"
+        self.page_source = ""
+        self.pages_loaded = 0
+        self.closed = False
+
+    def _download(self, url: str) -> str:
+        response = requests.get(url, timeout=self.page_load_timeout)
+        response.raise_for_status()
+        return response.text
+
+    def get(self, url: str):
+        self.current_url = url
+        self.page_source = "" if url == "about:blank" else self.source(url)
+        self.pages_loaded += 1
+
+    def execute_script(self, script: str, *args):
+        return "complete"
+
+    def find_elements(self, by: str, value: str) -> list:
+        if by != "css selector":
+            raise ValueError(f"FakeDriver ищет элементы только по CSS-селектору, а не '{by}'")
+        return html_parser.parse(self.page_source).select(value) if self.page_source else []
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.closed = True
+
+DRIVER_FACTORIES = {"chrome": chrome_driver, "fake": FakeDriver}
+
+def wait_ready(driver, selector: str = None, timeout: float = 20, poll: float = 0.1):
+    # Ожидание готовности вместо паузы фиксированной длины: документ построен и на нём есть элемент selector
+    deadline = time.monotonic() + timeout
+    while True:
+        if driver.execute_script("return document.readyState") in ("interactive", "complete") and \
+                (not selector or driver.find_elements("css selector", selector)):
+            return
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"Страница {driver.current_url} не готова за {timeout} с" + (f": нет элемента {selector}" if selector else ""))
+        time.sleep(poll)
+
+class Browser:
+    def __init__(self, driver, generation: int):
+        self.driver = driver
+        self.generation = generation
+        self.started = time.monotonic()
+        self.pages = 0
+
+class BrowserPool:
+    # size — сколько браузеров может работать одновременно (каждый — отдельный процесс Chrome).
+    # Браузеры запускаются по требованию; после ошибки браузер закрывается, а не возвращается в пул
+    def __init__(self, driver: str = "chrome", size: int = 1, max_pages: int = 50, max_age: float = 3600,
+                 page_timeout: float = 20, factory=None):
+        self._lock = threading.Lock()
+        self._idle = []
+        self._generation = 0
+        self.started = self.recycled = self.failed = 0
+        self.configure(driver, size, max_pages, max_age, page_timeout, factory)
+
+    def configure(self, driver: str = None, size: int = None, max_pages: int = None, max_age: float = None,
+                  page_timeout: float = None, factory=None):
+        # Браузеры прежних настроек закрываются: простаивающие сразу, занятые — когда освободятся
+        with self._lock:
+            if driver is not None:
+                if driver not in DRIVER_FACTORIES:
+                    raise ValueError(f"Неизвестный браузер '{driver}', доступны: {', '.join(DRIVER_FACTORIES)}")
+                self.driver = driver
+            if factory is not None:
+                self.factory = factory
+            elif driver is not None or not hasattr(self, "factory"):
+                self.factory = DRIVER_FACTORIES[self.driver]
+            if size is not None:
+                self.size = max(1, size)
+            if max_pages is not None:
+                self.max_pages = max(1, max_pages)
+            if max_age is not None:
+                self.max_age = max_age
+            if page_timeout is not None:
+                self.page_timeout = page_timeout
+            self._slots = threading.BoundedSemaphore(self.size)
+            self._generation += 1
+            idle, self._idle = self._idle, []
+        for browser in idle:
+            self._quit(browser)
+
+    def _quit(self, browser: Browser):
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            print(f"Не удалось закрыть браузер: {e}")
+
+    def _take(self) -> Browser:
+        expired = []
+        with self._lock:
+            now = time.monotonic()
+            while self._idle:
+                browser = self._idle.pop()
+                if now - browser.started < self.max_age:
+                    break
+                expired.append(browser)
+            else:
+                browser = None
+            self.recycled += len(expired)
+            generation, factory, page_timeout = self._generation, self.factory, self.page_timeout
+        # Закрытие браузера занимает время, другие потоки его не ждут
+        for old in expired:
+            self._quit(old)
+        if browser is not None:
+            return browser
+        try:
+            driver = factory(page_timeout)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.started += 1
+        return Browser(driver, generation)
+
+    def _give_back(self, browser: Browser):
+        # Страница сбрасывается, чтобы браузер не держал разметку и скрипты прошлого сайта между тиками
+        try:
+            browser.driver.get("about:blank")
+            browser.driver.delete_all_cookies()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            self._quit(browser)
+            return
+        with self._lock:
+            if browser.generation == self._generation and browser.pages < self.max_pages:
+                self._idle.append(browser)
+                return
+            self.recycled += 1
+        self._quit(browser)
+
+    @contextmanager
+    def browser(self, timeout: float = None):
+        # Браузер в монопольное пользование на время блока with
+        slots = self._slots
+        if not slots.acquire(timeout=timeout if timeout is not None else self.page_timeout):
+            raise TimeoutError("Нет свободного браузера")
+        try:
+            browser = self._take()
+            try:
+                yield browser.driver
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                self._quit(browser)
+                raise
+            browser.pages += 1
+            self._give_back(browser)
+        finally:
+            slots.release()
+
+    def load(self, url: str, ready: str = None, timeout: float = None) -> str:
+        # Разметка страницы после того, как на ней появился элемент ready
+        timeout = timeout if timeout is not None else self.page_timeout
+        with self.browser(timeout) as driver:
+            driver.get(url)
+            wait_ready(driver, ready, timeout)
+            return driver.page_source
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+        for browser in idle:
+            self._quit(browser)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"driver": self.driver, "size": self.size, "idle": len(self._idle), "started": self.started,
+                    "recycled": self.recycled, "failed": self.failed}
+
+# Общий пул процесса; браузеры закрываются при выходе, иначе процессы Chrome переживут приложение
+browser_pool = BrowserPool()
+atexit.register(browser_pool.close)
@@ -0,0 +1,190 @@
+import datetime, random, threading, time
+from urllib.parse import urlparse
+from requests.exceptions import RequestException, HTTPError
+from providers.rate_limiter import RateLimitedAdapter
+
+# Ответы, которые означают, что сайт не справляется или блокирует нас, а не ошибку в запросе
+FAILURE_STATUSES = {403, 429}
+
+class CircuitOpenError(RequestException):
+    # Запрос не отправлялся: сайт провайдера или его страница временно отключены
+    pass
+
+def failure_status(status: int) -> bool:
+    return status >= 500 or status in FAILURE_STATUSES
+
+def site_unavailable(error: Exception) -> bool:
+    # Ошибка соединения, таймаут, отключённая цепь или ответ 5xx/403/429: сайт недоступен, а не адрес устарел.
+    # Остальные ответы с ошибкой (404, 410) означают, что страницы по этому адресу больше нет
+    if isinstance(error, HTTPError) and error.response is not None:
+        return failure_status(error.response.status_code)
+    return isinstance(error, RequestException)
+
+class Circuit:
+    # Состояния: closed — запросы идут; open — запросы сразу отклоняются до retry_at;
+    # half_open — пропускается один пробный запрос, его исход закрывает или снова открывает цепь
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self.backoff = 0.0
+        self.retry_at = 0.0
+        self.probe_started = None
+        self.last_error = None
+        self.opened = 0
+
+    def permits(self, now: float, probe_timeout: float) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return now >= self.retry_at
+        # Пробный запрос, исход которого так и не пришёл, не держит цепь вечно
+        return self.probe_started is None or now - self.probe_started > probe_timeout
+
+    def admit(self, now: float):
+        if self.state != "closed":
+            self.state = "half_open"
+            self.probe_started = now
+
+    def succeed(self):
+        self.state = "closed"
+        self.failures = 0
+        self.backoff = 0.0
+        self.probe_started = None
+
+    def fail(self, error: str, threshold: int, base_backoff: float, max_backoff: float, now: float):
+        self.failures += 1
+        self.last_error = error
+        if self.state == "half_open":
+            # Неудачная проба: пауза удваивается
+            self.backoff = min(max_backoff, max(base_backoff, self.backoff * 2))
+        elif self.state == "closed" and self.failures >= threshold:
+            self.backoff = base_backoff
+        else:
+            return
+        self.state = "open"
+        self.opened += 1
+        self.probe_started = None
+        # Случайная добавка, чтобы пробы разных провайдеров не совпадали по времени
+        self.retry_at = now + self.backoff * random.uniform(1, 1.1)
+
+    def snapshot(self, now: float) -> dict:
+        retry_in = max(0.0, self.retry_at - now) if self.state == "open" else 0.0
+        return {"state": self.state, "failures": self.failures, "backoff": round(self.backoff, 1),
+                "retry_in": round(retry_in, 1), "opened": self.opened, "last_error": self.last_error}
+
+class CircuitBreakers:
+    # Цепи на провайдера и на каждую его страницу. Страница отключается после failure_threshold ошибок подряд,
+    # весь провайдер — после provider_failure_threshold ошибок подряд на любых страницах (сайт недоступен).
+    # Пауза до пробного запроса начинается с base_backoff секунд и удваивается до max_backoff
+    def __init__(self, failure_threshold: int = 3, provider_failure_threshold: int = 5,
+                 base_backoff: float = 30, max_backoff: float = 1800, probe_timeout: float = 60):
+        self._lock = threading.Lock()
+        self._circuits = {}
+        self.configure(failure_threshold, provider_failure_threshold, base_backoff, max_backoff, probe_timeout)
+
+    def configure(self, failure_threshold: int = None, provider_failure_threshold: int = None,
+                  base_backoff: float = None, max_backoff: float = None, probe_timeout: float = None):
+        with self._lock:
+            if failure_threshold is not None:
+                self.failure_threshold = max(1, failure_threshold)
+            if provider_failure_threshold is not None:
+                self.provider_failure_threshold = max(1, provider_failure_threshold)
+            if base_backoff is not None:
+                self.base_backoff = base_backoff
+            if max_backoff is not None:
+                self.max_backoff = max_backoff
+            if probe_timeout is not None:
+                self.probe_timeout = probe_timeout
+
+    def _circuit(self, provider: str, endpoint: str = None) -> Circuit:
+        key = (provider, endpoint)
+        if key not in self._circuits:
+            self._circuits[key] = Circuit(endpoint or provider)
+        return self._circuits[key]
+
+    def available(self, provider: str) -> bool:
+        # Можно ли обращаться к провайдеру (без захвата пробы): отключённого провайдера тик пропускает целиком
+        with self._lock:
+            return self._circuit(provider).permits(time.monotonic(), self.probe_timeout)
+
+    def retry_at(self, provider: str) -> datetime.datetime:
+        with self._lock:
+            delay = max(0.0, self._circuit(provider).retry_at - time.monotonic())
+        return datetime.datetime.now() + datetime.timedelta(seconds=delay)
+
+    def allow(self, provider: str, endpoint: str) -> bool:
+        # Запрос проходит, только если его пропускают и цепь провайдера, и цепь страницы
+        with self._lock:
+            now = time.monotonic()
+            circuits = [self._circuit(provider), self._circuit(provider, endpoint)]
+            if not all(circuit.permits(now, self.probe_timeout) for circuit in circuits):
+                return False
+            for circuit in circuits:
+                circuit.admit(now)
+            return True
+
+    def record(self, provider: str, endpoint: str, error: str = None):
+        with self._lock:
+            now = time.monotonic()
+            for circuit, threshold in ((self._circuit(provider), self.provider_failure_threshold),
+                                       (self._circuit(provider, endpoint), self.failure_threshold)):
+                if error is None:
+                    circuit.succeed()
+                else:
+                    circuit.fail(error, threshold, self.base_backoff, self.max_backoff, now)
+
+    def reset(self, provider: str = None) -> int:
+        # Закрывает цепи провайдера (или все) вручную; возвращает число сброшенных цепей
+        with self._lock:
+            keys = [key for key in self._circuits if provider is None or key[0] == provider]
+            for key in keys:
+                del self._circuits[key]
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            providers = {}
+            for (provider, endpoint), circuit in self._circuits.items():
+                entry = providers.setdefault(provider, {"endpoints": {}})
+                if endpoint is None:
+                    entry.update(circuit.snapshot(now))
+                else:
+                    entry["endpoints"][endpoint] = circuit.snapshot(now)
+            return providers
+
+class CircuitBreakerAdapter(RateLimitedAdapter):
+    # Стоит между кэшем и ограничителем: отклонённый запрос не тратит токен хоста и не ждёт таймаута.
+    # endpoints — пары (имя страницы, фрагмент адреса); адреса без совпадения относятся к странице "other"
+    def __init__(self, limiter, breakers: CircuitBreakers = None, provider: str = None, endpoints: list = (), **kwargs):
+        self.breakers = breakers
+        self.provider = provider
+        self.endpoints = list(endpoints)
+        super().__init__(limiter, **kwargs)
+
+    def endpoint(self, url: str) -> str:
+        for name, fragment in self.endpoints:
+            if fragment in url:
+                return name
+        return "other"
+
+    def send(self, request, **kwargs):
+        if self.breakers is None or self.provider is None:
+            return super().send(request, **kwargs)
+        endpoint = self.endpoint(request.url)
+        if not self.breakers.allow(self.provider, endpoint):
+            raise CircuitOpenError(f"[{self.provider}] Страница {endpoint} ({urlparse(request.url).hostname}) временно отключена", request=request)
+        try:
+            response = super().send(request, **kwargs)
+        except RequestException as e:
+            self.breakers.record(self.provider, endpoint, f"{type(e).__name__}: {e}")
+            raise
+        if failure_status(response.status_code):
+            self.breakers.record(self.provider, endpoint, f"HTTP {response.status_code}")
+        else:
+            self.breakers.record(self.provider, endpoint)
+        return response
+
+# Общий набор цепей процесса
+circuit_breakers = CircuitBreakers()
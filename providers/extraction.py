@@ -0,0 +1,164 @@
+import re
+from providers.html_parser import backend_available, compile_selector
+
+# Части суток в ключах прогноза make_forecast_dummy: temp_morn, temp_day, temp_even, temp_night
+DAY_PARTS = ("morn", "day", "even", "night")
+
+def day_parts(prefix: str, parts: tuple = DAY_PARTS) -> list:
+    return [f"{prefix}_{part}" for part in parts]
+
+def class_starts(tag: str, prefix: str) -> str:
+    # Селектор элементов, у которых один из классов начинается с prefix (классы с хешем сборки у Яндекса)
+    return f'{tag}[class^="{prefix}"], {tag}[class*=" {prefix}"]'
+
+# Преобразования значений
+def to_int(text):
+    try:
+        return int(text.replace("−", "-").replace("°", "").replace("+", "").replace("C", "").replace("%", ""))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def ms_to_kmh(text):
+    # Скорость ветра из м/с («3,4») в км/ч
+    return int(float(text.replace(",", ".")) * 3.6)
+
+class Scope:
+    # Часть страницы, из которой читаются поля: первый элемент по селектору, у которого в label_select
+    # (или во всём тексте) встречается label. name — название части для сообщения, если её нет на странице
+    def __init__(self, name: str, select: str, label: str = None, label_select: str = None):
+        self.name = name
+        self.select = select
+        self.label = label
+        self.label_select = label_select
+
+    def selectors(self) -> list:
+        return [selector for selector in (self.select, self.label_select) if selector]
+
+class Field:
+    # Описание одного или нескольких полей make_dummy/make_forecast_dummy:
+    # - select — элементы-кандидаты, label/label_select — отбор по подписи (без учёта регистра);
+    # - value — вложенный элемент со значением, attr — атрибут вместо текста;
+    # - pattern/group — регулярное выражение: значения, где оно не нашлось, пропускаются;
+    # - convert — преобразование значения (ошибка даёт default для всех ключей поля);
+    # - keys — один ключ (берётся значение с номером offset) или список ключей, которым по порядку
+    #   достаются значения начиная с offset (например, части суток); если значений меньше, все ключи пусты;
+    # - combine — функция над count значениями начиная с offset (максимум УФ-индекса за сутки)
+    def __init__(self, keys, select: str, value: str = None, attr: str = None, label: str = None, label_select: str = None,
+                 pattern: str = None, group: int = 0, convert=None, offset: int = 0, count: int = None, combine=None,
+                 default=None, scope: Scope = None):
+        self.keys = [keys] if isinstance(keys, str) else list(keys)
+        self.slotted = not isinstance(keys, str)
+        self.select = select
+        self.value = value
+        self.attr = attr
+        self.label = label.casefold() if label else None
+        self.label_select = label_select
+        self.pattern = re.compile(pattern) if pattern else None
+        self.group = group
+        self.convert = convert
+        self.offset = offset
+        self.count = len(self.keys) if self.slotted else (count or 1)
+        self.combine = combine
+        self.default = default
+        self.scope = scope
+
+    def selectors(self) -> list:
+        return [selector for selector in (self.select, self.value, self.label_select) if selector]
+
+    def empty(self) -> dict:
+        return {key: self.default for key in self.keys}
+
+    def _read(self, item):
+        node = item.select_one(self.value) if self.value else item
+        if node is None:
+            return None
+        text = node.get(self.attr) if self.attr else node.get_text(strip=True)
+        if text is None or self.pattern is None:
+            return text
+        match = self.pattern.search(text)
+        return match.group(self.group) if match else None
+
+    def values(self, items):
+        # Значения считаются лениво: одиночному полю не нужно читать элементы после offset
+        for item in items:
+            text = self._read(item)
+            if text is not None:
+                yield self.convert(text) if self.convert else text
+
+    def extract(self, items: list) -> dict:
+        values = []
+        for value in self.values(items):
+            values.append(value)
+            if len(values) == self.offset + self.count:
+                break
+        chunk = values[self.offset:]
+        if len(chunk) < self.count:
+            if self.slotted and values:
+                raise ValueError(f"найдено {len(chunk)} значений из {self.count}")
+            return self.empty()
+        if self.combine:
+            return {self.keys[0]: self.combine(chunk)}
+        if self.slotted:
+            return dict(zip(self.keys, chunk))
+        return {self.keys[0]: chunk[0]}
+
+class FieldSpec:
+    # Декларативное описание всего, что провайдер читает со страницы. Селекторы компилируются один раз
+    # при создании описания, а при разборе каждый селектор (и каждый отбор по подписи) выполняется
+    # один раз на страницу: поля с общими элементами, например строки деталей, читают одну выборку
+    def __init__(self, fields: list):
+        self.fields = list(fields)
+        if backend_available("lxml"):
+            for selector in self.selectors():
+                compile_selector(selector)
+
+    def selectors(self) -> set:
+        selectors = set()
+        for field in self.fields:
+            selectors.update(field.selectors())
+            if field.scope:
+                selectors.update(field.scope.selectors())
+        return selectors
+
+    @staticmethod
+    def _labelled(items: list, label: str, label_select: str) -> list:
+        labelled = []
+        for item in items:
+            node = item.select_one(label_select) if label_select else item
+            if node is not None and label in node.get_text().casefold():
+                labelled.append(item)
+        return labelled
+
+    def extract(self, document, provider_name: str) -> dict:
+        selections = {}
+        scopes = {}
+
+        def select(container, scope, selector, label=None, label_select=None):
+            key = (scope, selector, label, label_select)
+            if key not in selections:
+                if label:
+                    selections[key] = self._labelled(select(container, scope, selector), label, label_select)
+                else:
+                    selections[key] = container.select(selector)
+            return selections[key]
+
+        result = {}
+        for field in self.fields:
+            container = document
+            if field.scope:
+                if field.scope not in scopes:
+                    scope = field.scope
+                    found = select(document, None, scope.select, scope.label.casefold() if scope.label else None, scope.label_select)
+                    scopes[scope] = found[0] if found else None
+                    if not found:
+                        print(f"[{provider_name}] На странице не найдена часть «{scope.name}»")
+                container = scopes[field.scope]
+                if container is None:
+                    result.update(field.empty())
+                    continue
+            try:
+                result.update(field.extract(select(container, field.scope, field.select, field.label, field.label_select)))
+            except Exception as e:
+                print(f"[{provider_name}] Не удалось прочитать {', '.join(field.keys)}. Исключение: {e}")
+                result.update(field.empty())
+        return result
@@ -0,0 +1,161 @@
+import re
+from functools import lru_cache
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Порядок предпочтения. lxml — дерево lxml с тем же подмножеством API BeautifulSoup, которым пользуются провайдеры,
+# и заранее скомпилированными селекторами: без построения объектов bs4 разбор страницы в десятки раз быстрее.
+# bs4-lxml и html.parser — BeautifulSoup с соответствующим построителем дерева
+PARSER_BACKENDS = ["lxml", "bs4-lxml", "html.parser"]
+BACKEND_MODULES = {
+    "lxml": ["lxml.html", "cssselect"],
+    "bs4-lxml": ["lxml"],
+    "html.parser": [],
+}
+# Как и в BeautifulSoup, текст скриптов, стилей и шаблонов не входит в get_text
+SKIPPED_TEXT_TAGS = {"script", "style", "template"}
+
+def backend_available(backend: str) -> bool:
+    try:
+        for module in BACKEND_MODULES[backend]:
+            __import__(module)
+        return True
+    except (ImportError, KeyError):
+        return False
+
+@lru_cache(maxsize=None)
+def compile_selector(selector: str):
+    from cssselect import HTMLTranslator
+    from lxml import etree
+    return etree.XPath(HTMLTranslator().css_to_xpath(selector))
+
+class Regions:
+    # Части страницы, которые читает провайдер: элементы, у которых один из классов начинается с префикса
+    # из classes или имя тега входит в tags, сохраняются целиком вместе с потомками, остальная разметка отбрасывается.
+    # Области задаются с запасом: в них должны входить все элементы, к которым обращаются селекторы провайдера
+    def __init__(self, classes: list = (), tags: list = ()):
+        self.class_prefixes = tuple(classes)
+        self.tags = frozenset(tags)
+        self.class_pattern = re.compile("|".join(f"^{re.escape(prefix)}" for prefix in self.class_prefixes)) if self.class_prefixes else None
+        self._xpath = None
+
+    def xpath(self, root):
+        # Условие областей компилируется в XPath при первом разборе
+        if self._xpath is None:
+            from lxml import etree
+            conditions = [f"self::{tag}" for tag in sorted(self.tags)]
+            conditions += [f"contains(concat(' ', normalize-space(@class)), ' {prefix}')" for prefix in self.class_prefixes]
+            self._xpath = etree.XPath(f"//*[{' or '.join(conditions) or 'false()'}]")
+        return self._xpath(root)
+
+    def strainer(self):
+        # SoupStrainer объединяет условия по тегу и атрибутам через И, поэтому области с тегами BeautifulSoup не фильтрует
+        if self.tags or self.class_pattern is None:
+            return None
+        return SoupStrainer(attrs={"class": self.class_pattern})
+
+class LxmlNode:
+    # Обёртка элемента lxml с select/select_one/get/get_text, совместимыми с BeautifulSoup: ими читают описания полей FieldSpec
+    __slots__ = ("element", "root")
+
+    def __init__(self, element, root=None):
+        self.element = element
+        self.root = root if root is not None else element
+
+    def __bool__(self):
+        return True
+
+    @property
+    def name(self) -> str:
+        return self.element.tag
+
+    def __getitem__(self, name: str):
+        return self.element.attrib[name]
+
+    def get(self, name: str, default=None):
+        return self[name] if name in self.element.attrib else default
+
+    def _strings(self, element):
+        if element.text:
+            yield element.text
+        for child in element:
+            # Комментарии и инструкции обработки пропускаются, их хвостовой текст — нет
+            if isinstance(child.tag, str) and child.tag not in SKIPPED_TEXT_TAGS:
+                yield from self._strings(child)
+            if child.tail:
+                yield child.tail
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        strings = self._strings(self.element)
+        if strip:
+            strings = (string.strip() for string in strings)
+            strings = (string for string in strings if string)
+        return separator.join(strings)
+
+    @property
+    def text(self) -> str:
+        return self.get_text()
+
+    def _wrap(self, element):
+        return LxmlNode(element, self.root)
+
+    def select(self, selector: str) -> list:
+        # Как в soupsieve: селектор проверяется в контексте всего документа, результат — потомки узла
+        matches = compile_selector(selector)(self.root)
+        if self.element is not self.root:
+            matches = [element for element in matches if any(ancestor is self.element for ancestor in element.iterancestors())]
+        return [self._wrap(element) for element in matches]
+
+    def select_one(self, selector: str):
+        matches = self.select(selector)
+        return matches[0] if matches else None
+
+class HtmlParser:
+    def __init__(self, backend: str = "auto"):
+        self.configure(backend)
+
+    def configure(self, backend: str = "auto"):
+        if backend == "auto":
+            backend = next(name for name in PARSER_BACKENDS if backend_available(name))
+        elif not backend_available(backend):
+            print(f"Парсер HTML '{backend}' недоступен, используется html.parser")
+            backend = "html.parser"
+        self.backend = backend
+
+    def parse(self, markup: str, regions: Regions = None):
+        if self.backend == "lxml":
+            return self._parse_lxml_regions(markup, regions) if regions else self._parse_lxml(markup)
+        builder = "lxml" if self.backend == "bs4-lxml" else "html.parser"
+        return BeautifulSoup(markup, builder, parse_only=regions.strainer() if regions else None)
+
+    def _parse_lxml(self, markup: str) -> LxmlNode:
+        import lxml.html
+        from lxml import etree
+        try:
+            try:
+                document = lxml.html.document_fromstring(markup)
+            except ValueError:
+                # Строка с XML-объявлением кодировки разбирается как байты
+                document = lxml.html.document_fromstring(markup.encode("utf-8"))
+        except etree.ParserError:
+            # Пустая страница даёт пустой документ, как у BeautifulSoup
+            document = lxml.html.document_fromstring("<html></html>")
+        return LxmlNode(document)
+
+    def _parse_lxml_regions(self, markup: str, regions: Regions) -> LxmlNode:
+        from lxml import etree
+        # Разбор целиком идёт в C, затем верхние элементы областей одним запросом XPath переносятся в отдельный документ,
+        # а остальное дерево сразу освобождается: поиск провайдера обходит только области
+        document = etree.Element("document")
+        selected = set()
+        for element in regions.xpath(self._parse_lxml(markup).element):
+            # Вложенная область уже входит во внешнюю
+            if any(ancestor in selected for ancestor in element.iterancestors()):
+                continue
+            selected.add(element)
+            # Текст после области ей не принадлежит
+            element.tail = None
+            document.append(element)
+        return LxmlNode(document)
+
+# Общий парсер процесса, выбирается настройкой html_parser
+html_parser = HtmlParser()
@@ -0,0 +1,228 @@
+import email.utils, hashlib, json, os, threading, time
+from collections import OrderedDict
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from providers.circuit_breaker import CircuitBreakerAdapter
+
+# Тело хранится уже распакованным, поэтому заголовки транспорта не сохраняются
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+def cache_directives(headers) -> dict:
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+def freshness_lifetime(headers) -> float:
+    # max-age важнее Expires; без них ответ хранится только для повторной проверки
+    directives = cache_directives(headers)
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(0, int(directives["max-age"]))
+        except ValueError:
+            return 0
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            date = email.utils.parsedate_to_datetime(headers.get("Date")) if headers.get("Date") else None
+            expires_at = email.utils.parsedate_to_datetime(expires)
+            return max(0, (expires_at.timestamp() - (date.timestamp() if date else time.time())))
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+class HttpCache:
+    # Дисковый кэш ответов GET: свежие отдаются без запроса, устаревшие проверяются по ETag/Last-Modified.
+    # Общий объём ограничен, при переполнении удаляются давно не использованные записи
+    def __init__(self, directory: str = "http_cache", max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def configure(self, directory: str = None, max_bytes: int = None):
+        with self._lock:
+            if directory is not None and directory != self.directory:
+                self.directory = directory
+                self._loaded = False
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self.load()
+            self._evict()
+
+    def load(self):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for filename in os.listdir(self.directory):
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        size = json.load(f)["size"]
+                    entries.append((os.path.getmtime(path), filename[:-5], size))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Повреждённая запись HTTP-кэша {filename}: {e}")
+            # Время изменения метаданных — время последнего использования записи
+            self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+            self._size = sum(self._index.values())
+            self._loaded = True
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return f"{base}.json", f"{base}.body"
+
+    @staticmethod
+    def key(method: str, url: str) -> str:
+        return hashlib.sha256(f"{method} {url}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        # (метаданные, тело) или None
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            if key not in self._index:
+                return None
+            meta_path, body_path = self._paths(key)
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                with open(body_path, "rb") as f:
+                    body = f.read()
+                os.utime(meta_path)
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            return meta, body
+
+    def put(self, key: str, url: str, status: int, headers, body: bytes, lifetime: float):
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            meta = {
+                "url": url,
+                "status": status,
+                "headers": {name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS},
+                "expires": time.time() + lifetime,
+            }
+            meta_json = json.dumps({**meta, "size": 0}, ensure_ascii=False)
+            meta["size"] = len(body) + len(meta_json.encode("utf-8"))
+            if meta["size"] > self.max_bytes:
+                return
+            meta_path, body_path = self._paths(key)
+            try:
+                with open(f"{body_path}.tmp", "wb") as f:
+                    f.write(body)
+                os.replace(f"{body_path}.tmp", body_path)
+                with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(f"{meta_path}.tmp", meta_path)
+            except OSError as e:
+                print(f"Не удалось сохранить ответ в HTTP-кэш: {e}")
+                return
+            self._size += meta["size"] - self._index.pop(key, 0)
+            self._index[key] = meta["size"]
+            self._evict()
+
+    def refresh(self, key: str, meta: dict, headers, lifetime: float):
+        # Ответ 304: тело прежнее, обновляются срок свежести и валидаторы
+        with self._lock:
+            meta["headers"].update({name: value for name, value in headers.items() if name.lower() not in DROPPED_HEADERS})
+            meta["expires"] = time.time() + lifetime
+            meta_path, _ = self._paths(key)
+            try:
+                with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False)
+                os.replace(f"{meta_path}.tmp", meta_path)
+            except OSError as e:
+                print(f"Не удалось обновить запись HTTP-кэша: {e}")
+
+    def _remove(self, key: str):
+        self._size -= self._index.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._index:
+            self._remove(next(iter(self._index)))
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._index), "bytes": self._size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "revalidated": self.revalidated, "misses": self.misses, "evictions": self.evictions}
+
+class CachingAdapter(CircuitBreakerAdapter):
+    # Кэш стоит перед защитой от сбоев и ограничителем: свежий ответ из кэша отдаётся и при отключённом сайте
+    # и не тратит токен хоста
+    def __init__(self, cache: HttpCache, limiter, **kwargs):
+        self.cache = cache
+        super().__init__(limiter, **kwargs)
+
+    def _cached_response(self, request, meta: dict, body: bytes) -> Response:
+        response = Response()
+        response.status_code = meta["status"]
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.connection = self
+        return response
+
+    def send(self, request, **kwargs):
+        # Кэшируются только обычные GET без потокового чтения
+        if request.method != "GET" or kwargs.get("stream"):
+            return super().send(request, **kwargs)
+        key = self.cache.key(request.method, request.url)
+        cached = self.cache.get(key)
+        if cached is not None:
+            meta, body = cached
+            if meta["expires"] > time.time():
+                self.cache.hits += 1
+                return self._cached_response(request, meta, body)
+            # Устаревшая запись проверяется условным запросом
+            validators = CaseInsensitiveDict(meta["headers"])
+            request = request.copy()
+            if validators.get("ETag"):
+                request.headers["If-None-Match"] = validators["ETag"]
+            if validators.get("Last-Modified"):
+                request.headers["If-Modified-Since"] = validators["Last-Modified"]
+        response = super().send(request, **kwargs)
+        if cached is not None and response.status_code == 304:
+            self.cache.revalidated += 1
+            self.cache.refresh(key, meta, response.headers, freshness_lifetime(response.headers))
+            return self._cached_response(request, meta, body)
+        self.cache.misses += 1
+        directives = cache_directives(response.headers)
+        lifetime = freshness_lifetime(response.headers)
+        has_validators = "ETag" in response.headers or "Last-Modified" in response.headers
+        if (response.status_code == 200 and "no-store" not in directives and response.headers.get("Vary", "").strip() != "*"
+                and (lifetime > 0 or has_validators)):
+            self.cache.put(key, request.url, response.status_code, response.headers, response.content, lifetime)
+        return response
+
+# Общий кэш процесса для всех провайдеров
+http_cache = HttpCache()
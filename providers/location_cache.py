@@ -0,0 +1,99 @@
+import json, os, threading, time
+
+class LocationCache:
+    # Координаты, адреса и ключи городов не меняются, поэтому поиск города нужен не чаще раза в ttl.
+    # Ненайденные города тоже запоминаются (на negative_ttl), чтобы не повторять заведомо пустой поиск
+    def __init__(self, path: str = "location_cache.json", ttl: float = 30 * 24 * 3600, negative_ttl: float = 3600):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def configure(self, path: str = None, ttl: float = None, negative_ttl: float = None):
+        with self._lock:
+            if path is not None and path != self.path:
+                self.path = path
+                self._loaded = False
+            if ttl is not None:
+                self.ttl = ttl
+            if negative_ttl is not None:
+                self.negative_ttl = negative_ttl
+            self.load()
+
+    def load(self):
+        with self._lock:
+            entries = {}
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    records = json.load(f)
+                for record in records:
+                    entries[(record["provider"], record["city"])] = (record["found"], record["location"], record["expires"])
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Не удалось прочитать кэш городов {self.path}: {e}")
+            now = time.time()
+            self._entries = {key: entry for key, entry in entries.items() if entry[2] > now}
+            self._loaded = True
+
+    def _save(self):
+        records = [{"provider": provider, "city": city, "found": found, "location": location, "expires": expires}
+                   for (provider, city), (found, location, expires) in self._entries.items()]
+        # Запись через временный файл: прерванное сохранение не портит кэш
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Не удалось сохранить кэш городов {self.path}: {e}")
+
+    def get(self, provider: str, city: str):
+        # (найден ли город, его расположение) или None, если записи нет или она устарела
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            entry = self._entries.get((provider, city))
+            if entry is None or entry[2] <= time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, provider: str, city: str, location):
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            self._entries[(provider, city)] = (True, location, time.time() + self.ttl)
+            self._save()
+
+    def put_missing(self, provider: str, city: str):
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            self._entries[(provider, city)] = (False, None, time.time() + self.negative_ttl)
+            self._save()
+
+    def invalidate(self, provider: str = None, city: str = None) -> int:
+        # Без аргументов очищает кэш целиком
+        with self._lock:
+            if not self._loaded:
+                self.load()
+            keys = [key for key in self._entries
+                    if (provider is None or key[0] == provider) and (city is None or key[1] == city)]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._save()
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+# Общий кэш процесса для всех провайдеров
+location_cache = LocationCache()
@@ -0,0 +1,58 @@
+import random, threading, time
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+
+# Лимиты по умолчанию: запросов в секунду, запас подряд идущих запросов и случайная добавка к паузе (с)
+DEFAULT_LIMIT = {"rate": 1.0, "burst": 2, "jitter": 0.5}
+
+class HostRateLimiter:
+    # Ведро токенов на каждый хост: пауза нужна только тогда, когда хост недавно уже опрашивали
+    def __init__(self, limits: dict = None):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self.configure(limits or {})
+
+    def configure(self, limits: dict):
+        with self._lock:
+            self.default = {**DEFAULT_LIMIT, **limits.get("default", {})}
+            self.limits = {host: {**self.default, **limit} for host, limit in limits.items() if host != "default"}
+            self._buckets.clear()
+
+    def limit_for(self, host: str) -> dict:
+        # Лимит хоста действует и на его поддомены
+        for pattern, limit in self.limits.items():
+            if host == pattern or host.endswith(f".{pattern}"):
+                return limit
+        return self.default
+
+    def reserve(self, host: str) -> float:
+        # Токен резервируется сразу, а ждёт вызывающий поток вне блокировки:
+        # запросы к другим хостам не задерживаются
+        limit = self.limit_for(host)
+        rate, burst = max(limit["rate"], 1e-6), max(limit["burst"], 1)
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate) - 1
+            self._buckets[host] = (tokens, now)
+        if tokens >= 0:
+            return 0.0
+        return -tokens / rate + random.uniform(0, limit["jitter"])
+
+    def wait(self, host: str) -> float:
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+class RateLimitedAdapter(HTTPAdapter):
+    def __init__(self, limiter: HostRateLimiter, **kwargs):
+        self.limiter = limiter
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        self.limiter.wait(urlparse(request.url).hostname or "")
+        return super().send(request, **kwargs)
+
+# Общий ограничитель процесса: провайдеры в разных потоках делят лимиты одного хоста
+rate_limiter = HostRateLimiter()
@@ -1,31 +1,53 @@
-import re, time
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse
 from providers.weather_provider import WeatherProvider
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from providers.html_parser import Regions
+from providers.extraction import FieldSpec, Field, to_int
+from providers.browser_pool import browser_pool
+from providers.rate_limiter import rate_limiter
+from providers.circuit_breaker import circuit_breakers, CircuitOpenError
 
 class RP5Provider(WeatherProvider):
+    # Страницу RP5 собирают скрипты, поэтому она загружается браузером из общего пула, а не сессией requests
+    CURRENT_REGIONS = Regions(classes=["t_0", "p_0", "h_0"])
+    ENDPOINTS = [("current", "/Погода_в_")]
+    # Значения показаны в нескольких единицах: t_0 — °C, p_0 — мм рт. ст.
+    READY = "span.t_0"
+    # Соединения сессии браузеру не нужны: заранее их не открываем
+    USES_SESSION = False
+
+    CURRENT_FIELDS = FieldSpec([
+        Field("temp", "span.t_0", pattern=r"[−+-]?\d+", convert=to_int),
+        Field("pres", "span.p_0", pattern=r"\d+", convert=int),
+        Field("hum", "span.h_0", pattern=r"\d+", convert=int),
+    ])
+
     def __init__(self):
         super().__init__()
         self.provider_name = "RP5"
-        
-    def fetch(self, city: str) -> dict:
-        options = Options()
-        options.add_argument("--headless")
-        driver = webdriver.Chrome(options=options)
-        url = f"https://rp5.ru/Погода_в_{city}"
-        driver.get(url)
-        time.sleep(5)
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        driver.quit()
+        self.base_url = "https://rp5.ru"
+        self.browsers = browser_pool
+
+    def load_page(self, url: str, endpoint: str) -> str:
+        # Те же вежливые паузы и защита от сбоев, что у запросов через сессию
+        provider = self.__class__.__name__
+        if not circuit_breakers.allow(provider, endpoint):
+            raise CircuitOpenError(f"[{provider}] Страница {endpoint} ({urlparse(url).hostname}) временно отключена")
+        rate_limiter.wait(urlparse(url).hostname or "")
         try:
-            temp = soup.select_one("span.t_0").text.strip()
-            pressure = soup.select_one("span.p_0").text.strip()
-            humidity = soup.select_one("span.h_0").text.strip()
-        except:
-            temp = pressure = humidity = None
-        self.make_dummy(self.provider_name,
-                        city=city, 
-                        temp=temp,
-                        pres=pressure, 
-                        hum=humidity)
\ No newline at end of file
+            markup = self.browsers.load(url, self.READY)
+        except Exception as e:
+            circuit_breakers.record(provider, endpoint, f"{type(e).__name__}: {e}")
+            raise
+        circuit_breakers.record(provider, endpoint)
+        return markup
+
+    def fetch(self, city: str, location=None) -> dict:
+        # Страница города адресуется его названием
+        name = location or self.locate(city)
+        markup = self.load_page(f"{self.base_url}/Погода_в_{name}", "current")
+        current = self.extract(markup, self.CURRENT_REGIONS, self.CURRENT_FIELDS)
+        return self.make_dummy(self.provider_name, city=city, **current)
+
+    def fetch_forecast(self, city: str, location=None) -> dict:
+        # Прогноз RP5 не собирается
+        return None
@@ -1,8 +1,27 @@
 import requests
+from requests.exceptions import RequestException
+from urllib.parse import urlparse
+from urllib3.util.connection import is_connection_dropped
 import datetime as dt
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from providers.location_cache import location_cache
+from providers.rate_limiter import rate_limiter
+from providers.http_cache import http_cache, CachingAdapter
+from providers.circuit_breaker import circuit_breakers, site_unavailable
+from providers.html_parser import html_parser
+from providers.extraction import to_int
+
+# Потоки для независимых страниц одного провайдера (fetch_pages). Задачи в них не порождают новых,
+# а страницу, до которой очередь не дошла, вызывающий поток загружает сам, поэтому пул не может стать узким местом
+page_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="page")
 
 class WeatherProvider(ABC):
+    # Страницы сайта для защиты от сбоев: (имя, фрагмент адреса); у каждой своя цепь
+    ENDPOINTS = []
+    # Провайдеры, загружающие страницы не через self.session, заранее открытые соединения не используют
+    USES_SESSION = True
+
     def __init__(self):
         self.session = requests.Session()
         self.session.headers.update({
@@ -15,21 +34,149 @@ class WeatherProvider(ABC):
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
             "Connection": "keep-alive"
         })
+        self.session.hooks["response"].append(self._check_status)
+        self.configure_connections()
+        # Имя провайдера в кэше городов; у локальной подмены сайта свои адреса городов
+        self.location_key = self.__class__.__name__
     
-    def _safe_int(self, text):
+    @staticmethod
+    def _check_status(response, *args, **kwargs):
+        # Страница с ошибкой вместо данных — исключение, а не пустые поля или «город не найден».
+        # Тело читается до исключения, чтобы соединение вернулось в пул
+        if not response.ok:
+            response.content
+            response.raise_for_status()
+    
+    def configure_connections(self, pool_connections: int = 10, pool_maxsize: int = 10):
+        # Вежливые паузы между запросами к одному хосту вместо случайного sleep в каждом провайдере,
+        # повторные загрузки неизменившихся страниц обслуживает HTTP-кэш, недоступные страницы отключает защита от сбоев.
+        # pool_maxsize — сколько соединений с одним хостом переживают запрос и используются повторно
+        adapter = CachingAdapter(http_cache, rate_limiter, breakers=circuit_breakers, provider=self.__class__.__name__,
+                                 endpoints=self.ENDPOINTS, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def use_stand_in(self, stand_in: str = None):
+        # Нагрузочные испытания: запросы к сайту провайдера уходят на локальную подмену по адресу {stand_in}/{хост сайта}
+        self.site_url = getattr(self, "site_url", getattr(self, "base_url", None))
+        if not self.site_url:
+            return
+        if stand_in:
+            self.base_url = f"{stand_in.rstrip('/')}/{urlparse(self.site_url).hostname}"
+            self.location_key = f"{self.__class__.__name__}@{stand_in.rstrip('/')}"
+        else:
+            self.base_url = self.site_url
+            self.location_key = self.__class__.__name__
+    
+    def has_idle_connection(self, url: str) -> bool:
+        # Есть ли в пуле сессии открытое соединение с хостом url, которое подхватит следующий запрос.
+        # Ключ пула включает и параметры TLS, поэтому пулы сравниваются только по схеме, хосту и порту
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        manager = self.session.get_adapter(url).poolmanager
+        for key in manager.pools.keys():
+            if (key.key_scheme, key.key_host, key.key_port) != (parsed.scheme, parsed.hostname, port):
+                continue
+            pool = manager.pools.get(key)
+            if pool is not None and pool.pool is not None and any(conn is not None and not is_connection_dropped(conn) for conn in list(pool.pool.queue)):
+                return True
+        return False
+
+    def warm_up(self, timeout: float = 5) -> bool:
+        # Заранее открывает соединение с сайтом провайдера, если в пуле нет живого. Лёгкий HEAD идёт через ту же цепочку,
+        # что и обычные запросы: ограничитель хоста и защита от сбоев его учитывают (кэш пропускает всё, кроме GET)
+        url = getattr(self, "base_url", None)
+        if not self.USES_SESSION or not url or not circuit_breakers.available(self.__class__.__name__):
+            return False
+        if self.has_idle_connection(url):
+            return False
+        self.session.head(url, timeout=timeout)
+        return True
+    
+    def parse_html(self, markup: str, regions=None):
+        # Разбор страниц через общий парсер: бэкенд выбирается настройкой html_parser,
+        # regions ограничивает разбор частями страницы, которые читает провайдер
+        return html_parser.parse(markup, regions)
+    
+    def extract(self, markup: str, regions, spec) -> dict:
+        # Разбор страницы и чтение полей по декларативному описанию провайдера
+        return spec.extract(self.parse_html(markup, regions), self.provider_name)
+    
+    def fetch_page(self, url: str, regions, spec, timeout: float = 10) -> dict:
+        response = self.session.get(url, timeout=timeout)
+        return self.extract(response.text, regions, spec)
+    
+    def fetch_pages(self, pages: list) -> dict:
+        # Независимые страницы — (адрес, области, описание полей) — загружаются одновременно, и каждая
+        # разбирается сразу, как пришла. Первую страницу загружает вызывающий поток, остальные — page_executor.
+        # Ошибка любой страницы прерывает сбор, как и при последовательной загрузке
+        first, rest = pages[0], pages[1:]
+        futures = [page_executor.submit(self.fetch_page, *page) for page in rest]
+        fields = {}
         try:
-            return int(text.replace("−", "-").replace("°", "").replace("+", "").replace("C",""))
-        except:
-            return None
+            fields.update(self.fetch_page(*first))
+            for page, future in zip(rest, futures):
+                fields.update(self.fetch_page(*page) if future.cancel() else future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+        return fields
+    
+    def _safe_int(self, text):
+        return to_int(text)
     
     @abstractmethod
-    def fetch(self, city: str) -> dict:
+    def fetch(self, city: str, location=None) -> dict:
         pass
     
     @abstractmethod
-    def fetch_forecast(self, city: str) -> dict:
+    def fetch_forecast(self, city: str, location=None) -> dict:
         pass
     
+    def resolve_location(self, city: str):
+        # Провайдеры без отдельного поиска города работают по его названию
+        return city
+    
+    def locate(self, city: str):
+        # Расположение города берётся из кэша; поиск на сайте провайдера — только при промахе
+        provider = self.location_key
+        cached = location_cache.get(provider, city)
+        if cached is not None:
+            found, location = cached
+            if not found:
+                raise ValueError(f"[{provider}] Город '{city}' не найден (по данным кэша)")
+            return location
+        try:
+            location = self.resolve_location(city)
+        except ValueError as e:
+            # Битый ответ сайта (например, JSON) не означает, что города нет
+            if not isinstance(e, RequestException):
+                location_cache.put_missing(provider, city)
+            raise
+        location_cache.put(provider, city, location)
+        return location
+    
+    def fetch_all(self, city: str) -> tuple:
+        # Город ищется один раз и используется и для фактических данных, и для прогноза
+        location = self.locate(city)
+        current = forecast = None
+        errors = []
+        try:
+            current = self.fetch(city, location=location)
+        except Exception as e:
+            errors.append(e)
+            print(f"Ошибка у {self.__class__.__name__} при сборе фактических данных: {e}")
+        try:
+            forecast = self.fetch_forecast(city, location=location)
+        except Exception as e:
+            errors.append(e)
+            print(f"Ошибка у {self.__class__.__name__} при сборе прогноза: {e}")
+        if current is None and forecast is None and not any(site_unavailable(e) for e in errors):
+            # Возможно, адрес города устарел (например, страница отвечает 404): в следующем тике он будет найден заново.
+            # Недоступность сайта к адресу города отношения не имеет
+            location_cache.invalidate(self.location_key, city)
+        return current, forecast
+    
     def make_dummy(self,
                    source_name: str,
                    timestamp: dt.datetime | None = None,
@@ -0,0 +1,48 @@
+import datetime, threading
+import pandas as pd
+from collections import OrderedDict
+from storage.weather_store import WeatherStore
+from storage.time_index import TimeIndex
+
+class ReportCache:
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read_index(self, store: WeatherStore, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> TimeIndex:
+        key = (id(store), date_from, date_to)
+        # Одновременные запросы ждут одну загрузку, а не читают хранилище каждый сам
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == store.generation:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            generation = store.generation
+            full = self._entries.get((id(store), None, None))
+            if (date_from is not None or date_to is not None) and full and full[0] == generation:
+                # Полная история уже в памяти: диапазон вырезается бинарным поиском без обращения к хранилищу
+                df = full[1].select(date_from, date_to)
+            else:
+                # Поколение берётся вместе с выборкой: по нему строится курсор клиента, поэтому оно должно точно ей соответствовать
+                df, generation = store.read_versioned(date_from, date_to)
+            index = TimeIndex(df, generation)
+            self._entries[key] = (generation, index)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.misses += 1
+            return index
+
+    def read(self, store: WeatherStore, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> pd.DataFrame:
+        return self.read_index(store, date_from, date_to).df
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Общий кэш процесса для всех страниц и вкладок
+report_cache = ReportCache()
@@ -0,0 +1,38 @@
+import pandas as pd
+from openpyxl import Workbook
+from storage.weather_store import WeatherStore
+
+def iter_csv(store: WeatherStore, batch_size: int = 5000, **filters):
+    header = True
+    # BOM нужен, чтобы Excel правильно открыл кириллицу в CSV
+    yield "\ufeff"
+    for chunk in store.iter_batches(batch_size=batch_size, **filters):
+        yield chunk.to_csv(index=False, header=header)
+        header = False
+
+# Лист Excel вмещает 1 048 576 строк вместе с заголовком; write_only-лист openpyxl этого не проверяет
+XLSX_MAX_ROWS = 1048576
+
+def write_xlsx(store: WeatherStore, filename: str, batch_size: int = 5000, max_rows: int = XLSX_MAX_ROWS, **filters):
+    # В режиме write_only строки сразу сбрасываются на диск, память не растёт с историей.
+    # Длинная история продолжается на следующих листах, у каждого свой заголовок
+    workbook = Workbook(write_only=True)
+    sheet = None
+    columns = None
+    rows = 0
+    for chunk in store.iter_batches(batch_size=batch_size, **filters):
+        if columns is None:
+            columns = list(chunk.columns)
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            if sheet is None or rows >= max_rows:
+                sheet = workbook.create_sheet()
+                sheet.append(columns)
+                rows = 1
+            sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+            rows += 1
+    if sheet is None:
+        sheet = workbook.create_sheet()
+        if columns is not None:
+            sheet.append(columns)
+    workbook.save(filename)
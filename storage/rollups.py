@@ -0,0 +1,37 @@
+import pandas as pd
+
+# Показатели фактической погоды, по которым строятся агрегаты
+ROLLUP_METRICS = ["T0", "P0", "H0", "Ff", "AQI"]
+ROLLUP_PERIODS = {
+    "hour": "h",
+    "day": "D",
+}
+ROLLUP_KEYS = ["bucket", "source", "city"]
+
+def partial_columns(metric: str) -> list:
+    return [f"{metric}_count", f"{metric}_sum", f"{metric}_min", f"{metric}_max"]
+
+def aggregate_batch(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    # Частичные агрегаты (количество, сумма, минимум, максимум) можно складывать между пакетами
+    metrics = [metric for metric in ROLLUP_METRICS if metric in df.columns]
+    if df.empty or not metrics:
+        return pd.DataFrame()
+    values = df[metrics].apply(pd.to_numeric, errors="coerce")
+    values["bucket"] = pd.to_datetime(df["timestamp"]).dt.floor(ROLLUP_PERIODS[period])
+    values["source"] = df["source"].astype(object).fillna("")
+    values["city"] = df["city"].astype(object).fillna("")
+    grouped = values.groupby(ROLLUP_KEYS, sort=True, observed=True)
+    partials = pd.concat([grouped[metric].agg(["count", "sum", "min", "max"]).set_axis(partial_columns(metric), axis=1)
+                          for metric in metrics], axis=1)
+    return partials.reset_index()
+
+def finalize(partials: pd.DataFrame) -> pd.DataFrame:
+    df = partials[[key for key in ROLLUP_KEYS if key in partials.columns]].copy()
+    for metric in ROLLUP_METRICS:
+        count, total, minimum, maximum = partial_columns(metric)
+        if count not in partials.columns:
+            continue
+        df[f"{metric}_min"] = partials[minimum]
+        df[f"{metric}_max"] = partials[maximum]
+        df[f"{metric}_mean"] = partials[total] / partials[count].where(partials[count] > 0)
+    return df
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# Повторяющиеся строки хранятся как категории, измерения — как короткие целые с пропусками
+CATEGORY = "category"
+SMALL_INT = "Int16"
+SMALL_FLOAT = "float32"
+
+# Поля make_dummy
+CURRENT_SCHEMA = {
+    "city": CATEGORY,
+    "source": CATEGORY,
+    "T0": SMALL_INT,
+    # AccuWeather пересчитывает давление из гПа делением, значение может быть дробным
+    "P0": SMALL_FLOAT,
+    "H0": SMALL_INT,
+    "Ff": SMALL_INT,
+    "WD0": CATEGORY,
+    "UVI": SMALL_INT,
+    "conditions": CATEGORY,
+    "AQI": SMALL_INT,
+    "PM2.5": SMALL_FLOAT,
+    "PM10": SMALL_FLOAT,
+    "NO2": SMALL_FLOAT,
+    "O3": SMALL_FLOAT,
+    "CO": SMALL_FLOAT,
+    "SO2": SMALL_FLOAT,
+}
+
+# Поля make_forecast_dummy: утро, день, вечер, ночь
+FORECAST_SCHEMA = {
+    "city": CATEGORY,
+    "source": CATEGORY,
+    **{f"{prefix}{slot}1": dtype
+       for prefix, dtype in (("T", SMALL_INT), ("P", SMALL_INT), ("H", SMALL_INT), ("WS", SMALL_INT), ("WD", CATEGORY), ("Pr", CATEGORY))
+       for slot in "MDEN"},
+    "MaxUVI1": SMALL_INT,
+    "MinUVI1": SMALL_INT,
+}
+
+SCHEMA = {**CURRENT_SCHEMA, **FORECAST_SCHEMA}
+
+def apply_schema(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    columns = {}
+    if "timestamp" in df.columns:
+        columns["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    for column, dtype in SCHEMA.items():
+        if column not in df.columns:
+            continue
+        if dtype == CATEGORY:
+            columns[column] = df[column].astype(CATEGORY)
+        elif dtype == SMALL_INT:
+            columns[column] = pd.to_numeric(df[column], errors="coerce").round().astype(SMALL_INT)
+        else:
+            columns[column] = pd.to_numeric(df[column], errors="coerce").astype(dtype)
+    return df.assign(**columns)
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    typed = apply_schema(df)
+    report = pd.DataFrame({
+        "dtype_before": df.dtypes.astype(str),
+        "bytes_before": df.memory_usage(index=False, deep=True),
+        "dtype_after": typed.dtypes.astype(str),
+        "bytes_after": typed.memory_usage(index=False, deep=True),
+    })
+    report.loc["total"] = ["", report["bytes_before"].sum(), "", report["bytes_after"].sum()]
+    return report
+
+def synthetic_history(years: int = 3, interval_minutes: int = 5, seed: int = 0) -> pd.DataFrame:
+    # История наблюдений трёх провайдеров в том виде, в каком её собирают make_dummy и pandas без схемы
+    rng = np.random.default_rng(seed)
+    sources = np.array(["Gismeteo", "AccuWeather", "Яндекс.Погода"], dtype=object)
+    ticks = pd.date_range("2023-01-01", periods=years * 365 * 24 * 60 // interval_minutes, freq=f"{interval_minutes}min")
+    n = len(ticks) * len(sources)
+    return pd.DataFrame({
+        "timestamp": np.repeat(ticks.to_numpy(), len(sources)),
+        "city": np.full(n, "Екатеринбург", dtype=object),
+        "source": np.tile(sources, len(ticks)),
+        "T0": rng.integers(-35, 35, n),
+        "P0": rng.integers(720, 770, n).astype(np.float64),
+        "H0": rng.integers(20, 100, n),
+        "Ff": rng.integers(0, 40, n),
+        "WD0": rng.choice(np.array(["С", "СВ", "В", "ЮВ", "Ю", "ЮЗ", "З", "СЗ"], dtype=object), n),
+        "UVI": rng.integers(0, 9, n),
+        "conditions": rng.choice(np.array(["ясно", "облачно", "пасмурно", "небольшой дождь", "снег"], dtype=object), n),
+        "AQI": rng.integers(10, 150, n),
+        "PM2.5": rng.integers(0, 80, n).astype(np.float64),
+        "PM10": rng.integers(0, 80, n).astype(np.float64),
+        "NO2": rng.integers(0, 80, n).astype(np.float64),
+        "O3": rng.integers(0, 80, n).astype(np.float64),
+        "CO": rng.integers(0, 800, n).astype(np.float64),
+        "SO2": rng.integers(0, 40, n).astype(np.float64),
+    })
+
+if __name__ == "__main__":
+    history = synthetic_history()
+    report = memory_report(history)
+    print(f"Строк: {len(history)}")
+    print(report.to_string())
+    total = report.loc["total"]
+    print(f"Экономия памяти: {total['bytes_before'] / total['bytes_after']:.1f}x")
@@ -0,0 +1,335 @@
+import os, sqlite3, threading, datetime
+import pandas as pd
+from contextlib import closing
+from storage.weather_store import WeatherStore, PAGE_KEY, page_order
+from storage.schema import apply_schema
+from storage.rollups import ROLLUP_METRICS, ROLLUP_PERIODS, partial_columns, aggregate_batch, finalize
+
+class SQLiteWeatherStore(WeatherStore):
+    TABLE = "observations"
+    # Фиксированная ширина строки: лексикографический порядок совпадает с хронологическим
+    TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+    PARTITION_FORMATS = {
+        "day": "%Y-%m-%d",
+        "month": "%Y-%m",
+    }
+
+    def __init__(self, name: str, partition: str = "day"):
+        super().__init__(name)
+        if partition not in self.PARTITION_FORMATS:
+            raise ValueError(f"Неизвестный период секционирования '{partition}'")
+        # История хранится в каталоге базы: по одному файлу SQLite на день или месяц
+        self.directory = name
+        self.archive_directory = os.path.join(name, "archive")
+        # Агрегаты не секционируются и не удаляются по сроку хранения: они малы и нужны для длинных периодов
+        self.rollups_path = os.path.join(name, "rollups.sqlite")
+        self.partition = partition
+        self._lock = threading.RLock()
+        # Число открытых выгрузок: пока они идут, секции не перемещаются и не удаляются
+        self._readers = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._ensure_indexes()
+        self._ensure_rollups()
+        self._migrate_single_file()
+
+    def _migrate_single_file(self):
+        # Ранее вся история лежала в одном файле <имя>.sqlite
+        legacy_path = f"{self.name}.sqlite"
+        if not os.path.isfile(legacy_path):
+            return
+        print(f"Перенос истории из {legacy_path} в секции {self.directory}")
+        self.append(self._read_partition(legacy_path))
+        os.replace(legacy_path, f"{legacy_path}.migrated")
+
+    def _ensure_rollups(self):
+        backfill = not os.path.exists(self.rollups_path) and bool(self._partitions())
+        with closing(sqlite3.connect(self.rollups_path)) as conn:
+            metric_columns = ", ".join(f'"{column}" REAL' for metric in ROLLUP_METRICS for column in partial_columns(metric))
+            for period in ROLLUP_PERIODS:
+                conn.execute(f'CREATE TABLE IF NOT EXISTS "rollups_{period}" ("bucket" TEXT, "source" TEXT, "city" TEXT, {metric_columns}, '
+                             f'PRIMARY KEY ("bucket", "source", "city"))')
+            conn.commit()
+        if backfill:
+            # Агрегаты появились позже истории: один раз строим их по всем секциям
+            print(f"Построение агрегатов для {self.directory}")
+            for chunk in self.iter_batches():
+                self._update_rollups(chunk)
+
+    def _update_rollups(self, df_new: pd.DataFrame):
+        with closing(sqlite3.connect(self.rollups_path)) as conn:
+            for period in ROLLUP_PERIODS:
+                partials = aggregate_batch(df_new, period)
+                if partials.empty:
+                    continue
+                partials["bucket"] = partials["bucket"].dt.strftime(self.TIMESTAMP_FORMAT)
+                columns = list(partials.columns)
+                updates = []
+                for metric in ROLLUP_METRICS:
+                    count, total, minimum, maximum = partial_columns(metric)
+                    if count not in columns:
+                        continue
+                    # Скалярные min/max в SQLite возвращают NULL, если один из аргументов NULL
+                    updates += [
+                        f'"{count}" = coalesce("{count}", 0) + excluded."{count}"',
+                        f'"{total}" = coalesce("{total}", 0) + excluded."{total}"',
+                        f'"{minimum}" = min(coalesce("{minimum}", excluded."{minimum}"), coalesce(excluded."{minimum}", "{minimum}"))',
+                        f'"{maximum}" = max(coalesce("{maximum}", excluded."{maximum}"), coalesce(excluded."{maximum}", "{maximum}"))',
+                    ]
+                column_list = ", ".join(f'"{column}"' for column in columns)
+                sql = (f'INSERT INTO "rollups_{period}" ({column_list}) VALUES ({", ".join("?" for _ in columns)}) '
+                       f'ON CONFLICT ("bucket", "source", "city") DO UPDATE SET {", ".join(updates)}')
+                rows = partials.astype(object).where(partials.notna(), None).itertuples(index=False, name=None)
+                conn.executemany(sql, rows)
+            conn.commit()
+
+    def read_rollups(self, period: str, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                     source: str | None = None, city: str | None = None) -> pd.DataFrame:
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Неизвестный период агрегации '{period}'")
+        where, params = self._where(date_from, date_to, source, city)
+        where = where.replace('"timestamp"', '"bucket"')
+        with closing(sqlite3.connect(self.rollups_path)) as conn:
+            partials = pd.read_sql_query(f'SELECT * FROM "rollups_{period}" {where} ORDER BY "bucket"', conn, params=params,
+                                         parse_dates={"bucket": {"format": self.TIMESTAMP_FORMAT}})
+        return finalize(partials)
+
+    def _columns(self, conn) -> list:
+        return [row[1] for row in conn.execute(f'PRAGMA table_info("{self.TABLE}")')]
+
+    def _partition_key(self, timestamp: pd.Timestamp) -> str:
+        return timestamp.strftime(self.PARTITION_FORMATS[self.partition])
+
+    def _partition_range(self, key: str):
+        # Границы секции [start, end) по имени её файла
+        if len(key) == 7:
+            start = datetime.datetime.strptime(key, "%Y-%m")
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+        else:
+            start = datetime.datetime.strptime(key, "%Y-%m-%d")
+            end = start + datetime.timedelta(days=1)
+        return start, end
+
+    def _partitions(self) -> list:
+        partitions = []
+        for filename in os.listdir(self.directory):
+            key, ext = os.path.splitext(filename)
+            if ext != ".sqlite":
+                continue
+            try:
+                start, end = self._partition_range(key)
+            except ValueError:
+                continue
+            partitions.append((start, end, os.path.join(self.directory, filename)))
+        return sorted(partitions)
+
+    def _select_partitions(self, date_from: datetime.datetime | None, date_to: datetime.datetime | None) -> list:
+        return [(start, end, path) for start, end, path in self._partitions()
+                if (date_to is None or start < date_to) and (date_from is None or end > date_from)]
+
+    def _append_to_partition(self, df_new: pd.DataFrame, path: str):
+        with closing(sqlite3.connect(path)) as conn:
+            columns = self._columns(conn)
+            if not columns:
+                # WAL: длительная выгрузка не блокирует запись новых пакетов
+                conn.execute("PRAGMA journal_mode=WAL")
+            else:
+                # Новые поля провайдеров добавляются в таблицу без её пересоздания
+                for column in df_new.columns:
+                    if column not in columns:
+                        conn.execute(f'ALTER TABLE "{self.TABLE}" ADD COLUMN "{column}"')
+            df_new.to_sql(self.TABLE, conn, if_exists="append", index=False)
+            self._create_indexes(conn)
+            conn.commit()
+
+    def _create_indexes(self, conn):
+        # Диапазоны по времени и вторичные индексы по источнику и городу
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.TABLE}_timestamp" ON "{self.TABLE}" ("timestamp")')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.TABLE}_source_city" ON "{self.TABLE}" ("source", "city", "timestamp")')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.TABLE}_city" ON "{self.TABLE}" ("city", "timestamp")')
+        # Порядок постраничного чтения: по ключу страницы без сортировки всей секции
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.TABLE}_page" ON "{self.TABLE}" ("timestamp", "source", coalesce("city", \'\'))')
+
+    def _ensure_indexes(self):
+        # Секции, созданные до появления вторичных индексов, получают их при открытии хранилища
+        for _, _, path in self._partitions():
+            with closing(sqlite3.connect(path)) as conn:
+                if self._columns(conn):
+                    self._create_indexes(conn)
+                    conn.commit()
+
+    def _where(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+               source: str | None = None, city: str | None = None):
+        conditions = []
+        params = []
+        if date_from is not None:
+            conditions.append('"timestamp" >= ?')
+            params.append(date_from.strftime(self.TIMESTAMP_FORMAT))
+        if date_to is not None:
+            conditions.append('"timestamp" < ?')
+            params.append(date_to.strftime(self.TIMESTAMP_FORMAT))
+        if source is not None:
+            conditions.append('"source" = ?')
+            params.append(source)
+        if city is not None:
+            conditions.append('"city" = ?')
+            params.append(city)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+    def _query_partition(self, path: str, where: str = "", params: list = None, columns: list | None = None,
+                         order_by: str = "rowid", limit: int | None = None) -> pd.DataFrame:
+        with closing(sqlite3.connect(path)) as conn:
+            available = self._columns(conn)
+            if not available:
+                return pd.DataFrame()
+            # В выборку попадают только существующие колонки, имена из запроса не подставляются в SQL напрямую
+            selected = [column for column in columns if column in available] if columns else available
+            select = ", ".join(f'"{column}"' for column in selected)
+            sql = f'SELECT {select} FROM "{self.TABLE}" {where} ORDER BY {order_by}'
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            return pd.read_sql_query(sql, conn, params=params or [],
+                                     parse_dates={"timestamp": {"format": self.TIMESTAMP_FORMAT}} if "timestamp" in selected else None)
+
+    def _read_partition(self, path: str, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> pd.DataFrame:
+        where, params = self._where(date_from, date_to)
+        return self._query_partition(path, where, params)
+
+    def append(self, df_new: pd.DataFrame):
+        if df_new is None or df_new.empty:
+            return
+        # Схема применяется до записи: в файлы попадают уже приведённые значения
+        df_new = apply_schema(df_new)
+        timestamps = pd.to_datetime(df_new["timestamp"])
+        df_new = df_new.assign(timestamp=timestamps.dt.strftime(self.TIMESTAMP_FORMAT))
+        with self._lock:
+            # Пакет обычно попадает в одну секцию, но на границе суток может разделиться
+            for key, df_part in df_new.groupby(timestamps.apply(self._partition_key), sort=True):
+                self._append_to_partition(df_part, os.path.join(self.directory, f"{key}.sqlite"))
+            # Агрегаты обновляются только по новому пакету
+            self._update_rollups(df_new)
+            # Поколение меняется под блокировкой: чтение видит либо весь пакет вместе с его поколением, либо ни того, ни другого
+            self._record_batch(df_new.assign(timestamp=timestamps))
+
+    def read(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> pd.DataFrame:
+        with self._lock:
+            frames = [self._read_partition(path, date_from, date_to) for _, _, path in self._select_partitions(date_from, date_to)]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        return apply_schema(df.sort_values(by="timestamp", kind="stable", ignore_index=True))
+
+    def read_versioned(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> tuple:
+        with self._lock:
+            return self.read(date_from, date_to), self.generation
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            for _, _, path in self._partitions():
+                with closing(sqlite3.connect(path)) as conn:
+                    if self._columns(conn) and conn.execute(f'SELECT 1 FROM "{self.TABLE}" LIMIT 1').fetchone():
+                        return False
+        return True
+
+    def read_page(self, limit: int, before: tuple | None = None, columns: list | None = None,
+                  date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                  source: str | None = None, city: str | None = None) -> pd.DataFrame:
+        where, params = self._where(date_from, date_to, source, city)
+        upper = date_to
+        if before is not None:
+            # Ключ (время, источник, город): строки с тем же временем, что и у курсора, не теряются на границе страниц
+            timestamp, before_source, before_city = before
+            bound = timestamp.strftime(self.TIMESTAMP_FORMAT)
+            if before_source is None:
+                condition, key_params = '"timestamp" < ?', [bound]
+            else:
+                # Отдельное условие по времени позволяет начать обход индекса сразу с курсора
+                condition = '"timestamp" <= ? AND ("timestamp", "source", coalesce("city", \'\')) < (?, ?, ?)'
+                key_params = [bound, bound, before_source, before_city or ""]
+            where = f"{where} AND {condition}" if where else f"WHERE {condition}"
+            params += key_params
+            # Секция, которая начинается ровно в момент курсора, может содержать строки с тем же временем
+            after_bound = timestamp + datetime.timedelta(microseconds=1)
+            upper = after_bound if upper is None else min(upper, after_bound)
+        if columns:
+            columns = PAGE_KEY + [column for column in columns if column not in PAGE_KEY]
+        page = pd.DataFrame()
+        with self._lock:
+            # Секции просматриваются от новых к старым, пока они могут содержать строки новее уже собранных
+            for start, end, path in sorted(self._select_partitions(date_from, upper), key=lambda partition: partition[1], reverse=True):
+                if len(page) >= limit and end <= page["timestamp"].iloc[-1]:
+                    break
+                frame = self._query_partition(path, where, params, columns, limit=limit,
+                                              order_by='"timestamp" DESC, "source" DESC, coalesce("city", \'\') DESC')
+                if frame.empty:
+                    continue
+                page = pd.concat([page, frame], ignore_index=True) if not page.empty else frame
+                page = page_order(page).head(limit)
+        return apply_schema(page)
+
+    def iter_batches(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                     source: str | None = None, city: str | None = None, batch_size: int = 5000):
+        with self._lock:
+            partitions = self._select_partitions(date_from, date_to)
+            self._readers += 1
+        try:
+            # Общий набор колонок, чтобы пакеты из старых и новых секций совпадали по структуре
+            columns = []
+            for _, _, path in partitions:
+                with closing(sqlite3.connect(path)) as conn:
+                    columns += [column for column in self._columns(conn) if column not in columns]
+            where, params = self._where(date_from, date_to, source, city)
+            for _, _, path in partitions:
+                with closing(sqlite3.connect(path)) as conn:
+                    if not self._columns(conn):
+                        continue
+                    for chunk in pd.read_sql_query(f'SELECT * FROM "{self.TABLE}" {where} ORDER BY "timestamp"', conn, params=params,
+                                                   parse_dates={"timestamp": {"format": self.TIMESTAMP_FORMAT}}, chunksize=batch_size):
+                        yield apply_schema(chunk.reindex(columns=columns))
+        finally:
+            with self._lock:
+                self._readers -= 1
+
+    def _has_readers(self, operation: str) -> bool:
+        if self._readers:
+            print(f"{operation} {self.directory} отложено: идёт выгрузка отчёта")
+            return True
+        return False
+
+    def compact(self):
+        # Закрытые дневные секции сливаются в месячные, текущий день не трогаем
+        today = datetime.datetime.combine(datetime.date.today(), datetime.time())
+        with self._lock:
+            if self._has_readers("Объединение секций"):
+                return
+            for start, end, path in self._partitions():
+                if end - start != datetime.timedelta(days=1) or end > today:
+                    continue
+                df_day = self._read_partition(path)
+                if not df_day.empty:
+                    df_day["timestamp"] = df_day["timestamp"].dt.strftime(self.TIMESTAMP_FORMAT)
+                    self._append_to_partition(df_day, os.path.join(self.directory, f"{start:%Y-%m}.sqlite"))
+                os.remove(path)
+                print(f"Секция {os.path.basename(path)} объединена с {start:%Y-%m}.sqlite")
+
+    def apply_retention(self, retention_days: int, archive: bool = True):
+        if not retention_days or retention_days <= 0:
+            return
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+        removed = False
+        with self._lock:
+            if self._has_readers("Очистка секций"):
+                return
+            for start, end, path in self._partitions():
+                # Секция удаляется только целиком, когда все её данные старше срока хранения
+                if end > cutoff:
+                    continue
+                if archive:
+                    os.makedirs(self.archive_directory, exist_ok=True)
+                    os.replace(path, os.path.join(self.archive_directory, os.path.basename(path)))
+                else:
+                    os.remove(path)
+                removed = True
+                print(f"Секция {os.path.basename(path)} {'перенесена в архив' if archive else 'удалена'} по сроку хранения")
+            if removed:
+                self.generation += 1
@@ -0,0 +1,42 @@
+import os, threading
+import pandas as pd
+from storage.weather_store import WeatherStore
+from storage.sqlite_store import SQLiteWeatherStore
+
+BACKENDS = {
+    "sqlite": SQLiteWeatherStore,
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _normalize_name(database: str) -> str:
+    # Старые настройки указывают на .xlsx-файл, используем его имя как имя базы
+    name, ext = os.path.splitext(database)
+    return name if ext.lower() in (".xlsx", ".xls", ".sqlite") else database
+
+def _import_legacy_report(store: WeatherStore):
+    legacy_filename = f"{store.name}.xlsx"
+    if os.path.exists(legacy_filename) and store.is_empty():
+        print(f"Импорт истории из {legacy_filename}")
+        store.append(pd.read_excel(legacy_filename))
+
+def storage_options(settings: dict) -> dict:
+    return {
+        "backend": settings.get("storage_backend", "sqlite"),
+        "partition": settings.get("storage_partition", "day"),
+    }
+
+def get_store(database: str, backend: str = "sqlite", **options) -> WeatherStore:
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный тип хранилища '{backend}'")
+    name = _normalize_name(database)
+    key = (backend, os.path.abspath(name))
+    # Один экземпляр на базу в процессе: планировщик и веб-запросы видят общий счётчик поколений
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = BACKENDS[backend](name, **options)
+            _import_legacy_report(store)
+            _stores[key] = store
+    return store
@@ -0,0 +1,61 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+class TimeIndex:
+    # Вторичные индексы: позиции строк каждого источника, города и их пары
+    GROUP_KEYS = {
+        "source": ["source"],
+        "city": ["city"],
+        "source_city": ["source", "city"],
+    }
+
+    def __init__(self, df: pd.DataFrame, generation: int = 0):
+        # Строки должны быть упорядочены по времени: хранилище отдаёт их именно так.
+        # generation — поколение хранилища, которому соответствует выборка
+        self.df = df
+        self.generation = generation
+        self._groups = {}
+        if df.empty or "timestamp" not in df.columns:
+            self.timestamps = np.array([], dtype="datetime64[ns]")
+            return
+        self.timestamps = df["timestamp"].to_numpy(dtype="datetime64[ns]")
+        for name, columns in self.GROUP_KEYS.items():
+            if not set(columns).issubset(df.columns):
+                continue
+            key_columns = columns[0] if len(columns) == 1 else columns
+            for value, positions in df.groupby(key_columns, sort=False, dropna=True, observed=True).indices.items():
+                self._groups[(name, value)] = (positions, self.timestamps[positions])
+
+    def _bound(self, timestamps: np.ndarray, value: datetime.datetime | None, side: str, default: int) -> int:
+        if value is None:
+            return default
+        return int(np.searchsorted(timestamps, np.datetime64(pd.Timestamp(value).as_unit("ns")), side=side))
+
+    def positions(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                  source: str | None = None, city: str | None = None, after: datetime.datetime | None = None) -> np.ndarray:
+        # Бинарный поиск по отсортированным меткам времени: O(log n + k)
+        if source is not None and city is not None:
+            positions, timestamps = self._groups.get(("source_city", (source, city)), (np.array([], dtype=np.int64), self.timestamps[:0]))
+        elif source is not None or city is not None:
+            name, value = ("source", source) if source is not None else ("city", city)
+            positions, timestamps = self._groups.get((name, value), (np.array([], dtype=np.int64), self.timestamps[:0]))
+        else:
+            positions, timestamps = None, self.timestamps
+        start = self._bound(timestamps, date_from, "left", 0)
+        if after is not None:
+            start = max(start, self._bound(timestamps, after, "right", 0))
+        end = self._bound(timestamps, date_to, "left", len(timestamps))
+        if positions is None:
+            return np.arange(start, max(start, end))
+        return positions[start:max(start, end)]
+
+    def select(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+               source: str | None = None, city: str | None = None, after: datetime.datetime | None = None) -> pd.DataFrame:
+        if self.df.empty:
+            return self.df
+        positions = self.positions(date_from, date_to, source, city, after)
+        if source is None and city is None:
+            # Диапазон без фильтров — непрерывный срез, копирование не нужно
+            return self.df.iloc[positions[0]:positions[-1] + 1] if len(positions) else self.df.iloc[0:0]
+        return self.df.iloc[positions]
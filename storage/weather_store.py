@@ -0,0 +1,135 @@
+import os, datetime, uuid
+import pandas as pd
+from abc import ABC, abstractmethod
+from collections import deque
+from storage.rollups import aggregate_batch, finalize
+
+# Сколько последних пакетов помнит журнал записей: по нему клиент получает только строки, записанные после его курсора
+JOURNAL_BATCHES = 256
+# Ключ постраничного чтения: строки с одинаковым временем различаются источником и городом.
+# Курсор страницы — ключ последней отданной строки, следующая страница начинается строго после него
+PAGE_KEY = ["timestamp", "source", "city"]
+
+def page_key(df: pd.DataFrame) -> pd.DataFrame:
+    # Категории сравниваются по порядку категорий, а не по строкам, поэтому ключ строится по объектам.
+    # Пустой город равен '', как coalesce("city", '') в SQLite
+    return pd.DataFrame({"timestamp": df["timestamp"],
+                         "source": df["source"].astype(object).fillna(""),
+                         "city": df["city"].astype(object).fillna("") if "city" in df.columns else ""}, index=df.index)
+
+def page_order(df: pd.DataFrame) -> pd.DataFrame:
+    # Строки по убыванию ключа страницы
+    df = df.reset_index(drop=True)
+    order = page_key(df).sort_values(by=PAGE_KEY, ascending=False, kind="stable").index
+    return df.iloc[order].reset_index(drop=True)
+
+def before_key(df: pd.DataFrame, before: tuple) -> pd.Series:
+    # Строки строго раньше курсора (время, источник, город). Курсор прежнего формата содержит только время
+    timestamp, source, city = before
+    key = page_key(df)
+    older = key["timestamp"] < timestamp
+    if source is None:
+        return older
+    same = key["timestamp"] == timestamp
+    return older | (same & ((key["source"] < source) | ((key["source"] == source) & (key["city"] < (city or "")))))
+
+class WeatherStore(ABC):
+    def __init__(self, name: str):
+        # Имя базы без расширения: каждое хранилище само выбирает формат файлов
+        self.name = name
+        # Номер поколения данных: увеличивается после каждой записи пакета
+        self.generation = 0
+        # Счётчик поколений начинается заново при каждом запуске, эпоха отличает запуски друг от друга
+        self.epoch = uuid.uuid4().hex[:8]
+        # (поколение, пакет) в порядке записи. Пакеты разных городов собираются одновременно и пишутся по окончании сбора,
+        # поэтому более поздний пакет может содержать более ранние по времени строки: курсор строится по поколению, а не по времени
+        self._journal = deque(maxlen=JOURNAL_BATCHES)
+
+    @property
+    def version(self) -> str:
+        return f"{self.epoch}-{self.generation}"
+
+    def _record_batch(self, df_new: pd.DataFrame):
+        # Вызывается хранилищем после записи пакета. Запись в журнал идёт раньше смены поколения:
+        # читатель, увидевший новое поколение, найдёт в журнале и его пакет
+        self._journal.append((self.generation + 1, df_new))
+        self.generation += 1
+
+    def changes_since(self, generation: int, until: int = None) -> pd.DataFrame | None:
+        # Строки пакетов с поколениями (generation, until] в порядке записи. None — если журнал их уже не помнит
+        # или между ними было изменение без пакета (очистка по сроку хранения): тогда нужна полная выборка
+        until = self.generation if until is None else until
+        if generation > until:
+            return None
+        batches = [df for batch_generation, df in list(self._journal) if generation < batch_generation <= until]
+        if len(batches) != until - generation:
+            return None
+        return pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+
+    def read_versioned(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> tuple:
+        # Выборка и поколение, которому она соответствует; хранилища с блокировкой делают это атомарно
+        generation = self.generation
+        return self.read(date_from, date_to), generation
+
+    @abstractmethod
+    def append(self, df_new: pd.DataFrame):
+        pass
+
+    @abstractmethod
+    def read(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def is_empty(self) -> bool:
+        pass
+
+    def compact(self):
+        # Хранилища без секций обслуживания не требуют
+        pass
+
+    def apply_retention(self, retention_days: int, archive: bool = True):
+        pass
+
+    def iter_batches(self, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                     source: str | None = None, city: str | None = None, batch_size: int = 5000):
+        # Хранилища без построчного чтения отдают историю частями из полной выборки
+        df = self.read(date_from, date_to)
+        if df.empty:
+            return
+        if source is not None:
+            df = df[df["source"] == source]
+        if city is not None:
+            df = df[df["city"] == city]
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+
+    def read_page(self, limit: int, before: tuple | None = None, columns: list | None = None,
+                  date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                  source: str | None = None, city: str | None = None) -> pd.DataFrame:
+        # Страница строк по убыванию ключа PAGE_KEY, строго после курсора before
+        df = self.read(date_from, date_to)
+        if df.empty:
+            return df
+        if before is not None:
+            df = df[before_key(df, before)]
+        if source is not None:
+            df = df[df["source"] == source]
+        if city is not None:
+            df = df[df["city"] == city]
+        if columns:
+            # Колонки ключа нужны для курсора следующей страницы
+            df = df[[column for column in PAGE_KEY + [column for column in columns if column not in PAGE_KEY] if column in df.columns]]
+        return page_order(df).head(limit)
+
+    def read_rollups(self, period: str, date_from: datetime.datetime | None = None, date_to: datetime.datetime | None = None,
+                     source: str | None = None, city: str | None = None) -> pd.DataFrame:
+        # Хранилища без материализованных агрегатов считают их по полной выборке
+        df = self.read(date_from, date_to)
+        if source is not None and not df.empty:
+            df = df[df["source"] == source]
+        if city is not None and not df.empty:
+            df = df[df["city"] == city]
+        return finalize(aggregate_batch(df, period)) if not df.empty else pd.DataFrame()
+
+    def export_filename(self, extension: str) -> str:
+        return f"{os.path.basename(self.name)}.{extension}"
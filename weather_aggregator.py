@@ -1,54 +1,177 @@
-import os, datetime
+import datetime, time, threading
 import pandas as pd
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from storage.store_factory import get_store
 from providers.accuweather_provider import AccuWeatherProvider
 from providers.yandexweather_provider import YandexWeatherProvider
 from providers.gismeteo_provider import GismeteoProvider
+from providers.rp5_provider import RP5Provider
+from providers.circuit_breaker import circuit_breakers
+
+class FetchLimits:
+    # Ограничения общие для всех тиков процесса: тики разных городов могут пересекаться во времени
+    def __init__(self, max_concurrency: int = 6, provider_concurrency: int = 2, provider_concurrencies: dict = None):
+        self._lock = threading.Lock()
+        self.configure(max_concurrency, provider_concurrency, provider_concurrencies)
+
+    def configure(self, max_concurrency: int = 6, provider_concurrency: int = 2, provider_concurrencies: dict = None):
+        # Выполняющиеся задачи освобождают те семафоры, которые захватили, поэтому замена безопасна
+        with self._lock:
+            self.max_concurrency = max(1, max_concurrency)
+            self.provider_concurrency = max(1, provider_concurrency)
+            self.provider_concurrencies = provider_concurrencies or {}
+            self.global_slots = threading.BoundedSemaphore(self.max_concurrency)
+            self._provider_slots = {}
+
+    def provider_slots(self, provider) -> threading.BoundedSemaphore:
+        name = provider.__class__.__name__
+        with self._lock:
+            if name not in self._provider_slots:
+                limit = max(1, self.provider_concurrencies.get(name, self.provider_concurrency))
+                self._provider_slots[name] = threading.BoundedSemaphore(limit)
+            return self._provider_slots[name]
+
+fetch_limits = FetchLimits()
+
+def create_providers() -> list:
+    return [
+        GismeteoProvider(),
+        AccuWeatherProvider(),
+        YandexWeatherProvider(),
+        RP5Provider()
+    ]
+
+class ProviderPool:
+    # Провайдеры и их сессии живут всё время работы приложения: соединения keep-alive переходят из тика в тик.
+    # Пул пересоздаётся только при изменении параметров соединений или адреса локальной подмены сайтов
+    SETTINGS_KEYS = ("http_pool_connections", "http_pool_maxsize", "provider_stand_in")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers = None
+        self._key = None
+
+    def get(self, settings: dict) -> list:
+        key = tuple(settings.get(name) for name in self.SETTINGS_KEYS)
+        with self._lock:
+            if self._providers is None or key != self._key:
+                # Старые сессии не закрываются явно: ими ещё могут пользоваться задачи, превысившие срок
+                providers = create_providers()
+                for provider in providers:
+                    provider.configure_connections(settings.get("http_pool_connections", 10), settings.get("http_pool_maxsize", 10))
+                    provider.use_stand_in(settings.get("provider_stand_in"))
+                self._providers, self._key = providers, key
+            return self._providers
+
+    def warm_up(self, settings: dict, timeout: float = 5):
+        # Соединения с провайдерами, которые ходят через сессию, открываются параллельно; ошибки не мешают тику
+        providers = [provider for provider in self.get(settings) if provider.USES_SESSION]
+        if not providers:
+            return
+        with ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="warm-up") as executor:
+            futures = [(provider, executor.submit(provider.warm_up, timeout)) for provider in providers]
+            for provider, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[{provider.provider_name}] Не удалось заранее открыть соединение: {e}")
+
+provider_pool = ProviderPool()
 
 class WeatherAggregator:
-    def __init__(self, db_current_weather:str, db_forecast_weather:str):
-        self.providers = [
-            GismeteoProvider(),
-            AccuWeatherProvider(),
-            YandexWeatherProvider()
-        ]
-        self.db_current = db_current_weather
-        self.db_forecast = db_forecast_weather
-
-    def __append_to_report(self, df_new, report_filename):
-        # Если файл существует, читаем старые данные
-        if os.path.exists(report_filename):
-            df_old = pd.read_excel(report_filename)
-            df_combined = pd.concat([df_old, df_new], ignore_index=True)
-        else:
-            df_combined = df_new
-
-        # Сохраняем объединённую таблицу
-        df_combined.to_excel(report_filename, index=False)
+    def __init__(self, db_current_weather:str, db_forecast_weather:str, storage_options:dict = None,
+                 provider_deadline: float = 45, tick_budget: float = 90, provider_deadlines: dict = None,
+                 providers: list = None):
+        self.providers = providers or create_providers()
+        storage_options = storage_options or {}
+        self.db_current = get_store(db_current_weather, **storage_options)
+        self.db_forecast = get_store(db_forecast_weather, **storage_options)
+        # Срок ожидания одного провайдера (можно переопределить по имени класса) и общий бюджет тика, в секундах
+        self.provider_deadline = provider_deadline
+        self.provider_deadlines = provider_deadlines or {}
+        self.tick_budget = tick_budget
 
     def append_to_current_report(self, df_new):
-        self.__append_to_report(df_new, self.db_current)
+        # Дописываем только новый пакет, не перечитывая историю
+        self.db_current.append(df_new)
 
     def append_to_forecast_report(self, df_new):
-        self.__append_to_report(df_new, self.db_forecast)
+        self.db_forecast.append(df_new)
     
-    def collect_current_data(self, city: str):
-        data = []
-        print(f"[{datetime.datetime.today().strftime("%Y-%m-%d %H:%M:%S")}] Запущен сбор фактических данных")
+    def _available_providers(self) -> list:
+        # Отключённый защитой от сбоев провайдер пропускается целиком: ни потока, ни запросов до времени пробы
+        available = []
         for provider in self.providers:
+            if circuit_breakers.available(provider.__class__.__name__):
+                available.append(provider)
+            else:
+                retry_at = circuit_breakers.retry_at(provider.__class__.__name__)
+                print(f"[{provider.provider_name}] Сайт временно отключён после ошибок, проба в {retry_at.strftime('%H:%M:%S')}")
+        return available
+
+    def _provider_deadline(self, provider) -> float:
+        return self.provider_deadlines.get(provider.__class__.__name__, self.provider_deadline)
+
+    def _run_limited(self, provider, job, deadline: float):
+        # Задача ждёт свободного места у провайдера и в общем пуле, но не дольше своего срока
+        provider_slots, global_slots = fetch_limits.provider_slots(provider), fetch_limits.global_slots
+        if not provider_slots.acquire(timeout=max(0, deadline - time.monotonic())):
+            raise TimeoutError()
+        try:
+            if not global_slots.acquire(timeout=max(0, deadline - time.monotonic())):
+                raise TimeoutError()
             try:
-                weather = provider.fetch(city)
-                data.append(weather)
-            except Exception as e:
-                print(f"Ошибка у {provider.__class__.__name__}: {e}")
-        return pd.DataFrame(data)
+                return job()
+            finally:
+                global_slots.release()
+        finally:
+            provider_slots.release()
+
+    def _run_concurrently(self, jobs: list) -> list:
+        # Все запросы тика идут параллельно: время тика определяется самым медленным провайдером, а не суммой
+        start = time.monotonic()
+        tick_deadline = start + self.tick_budget
+        # Сроки абсолютные от начала тика, поэтому последовательное ожидание не суммирует их
+        deadlines = [min(start + self._provider_deadline(provider), tick_deadline) for provider, job in jobs]
+        # Потоков по числу задач, чтобы ожидание занятого провайдера не задерживало остальных; одновременные запросы ограничивают семафоры
+        executor = ThreadPoolExecutor(max_workers=max(1, len(jobs)), thread_name_prefix="provider")
+        futures = [(provider, executor.submit(self._run_limited, provider, job, deadline))
+                   for (provider, job), deadline in zip(jobs, deadlines)]
+        results = []
+        try:
+            for (provider, future), deadline in zip(futures, deadlines):
+                try:
+                    results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+                except FutureTimeoutError:
+                    results.append(None)
+                    print(f"[{provider.provider_name}] Превышено время ожидания, данные провайдера пропущены")
+                except Exception as e:
+                    results.append(None)
+                    print(f"Ошибка у {provider.__class__.__name__}: {e}")
+        finally:
+            # Зависшие запросы не задерживают тик: их результат будет отброшен
+            executor.shutdown(wait=False, cancel_futures=True)
+        print(f"[{datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')}] Сбор завершён за {time.monotonic() - start:.1f} с")
+        return results
+
+    def collect_current_data(self, city: str):
+        print(f"[{datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')}] Запущен сбор фактических данных")
+        results = self._run_concurrently([(provider, partial(provider.fetch, city)) for provider in self._available_providers()])
+        return pd.DataFrame([weather for weather in results if weather is not None])
 
     def collect_forecast_data(self, city: str):
-        data = []
-        print(f"[{datetime.datetime.today().strftime("%Y-%m-%d %H:%M:%S")}] Запущен сбор данных прогноза")
-        for provider in self.providers:
-            try:
-                weather = provider.fetch_forecast(city)
-                data.append(weather)
-            except Exception as e:
-                print(f"Ошибка у {provider.__class__.__name__}: {e}")
-        return pd.DataFrame(data)
\ No newline at end of file
+        print(f"[{datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')}] Запущен сбор данных прогноза")
+        results = self._run_concurrently([(provider, partial(provider.fetch_forecast, city)) for provider in self._available_providers()])
+        return pd.DataFrame([weather for weather in results if weather is not None])
+
+    def collect_data(self, cities: str | list):
+        # Фактические данные и прогноз собираются в одном тике с общим бюджетом времени
+        cities = [cities] if isinstance(cities, str) else list(cities)
+        print(f"[{datetime.datetime.today().strftime('%Y-%m-%d %H:%M:%S')}] Запущен сбор фактических данных и прогноза: {', '.join(cities)}")
+        # Одна задача на пару город-провайдер: город ищется один раз на оба набора данных
+        providers = self._available_providers()
+        results = self._run_concurrently([(provider, partial(provider.fetch_all, city)) for city in cities for provider in providers])
+        current = [result[0] for result in results if result is not None and result[0] is not None]
+        forecast = [result[1] for result in results if result is not None and result[1] is not None]
+        return pd.DataFrame(current), pd.DataFrame(forecast)